@@ -0,0 +1,309 @@
+from array import array
+
+from sketch import KLLSketch
+
+def merge_stat(target, key, stat, copy=True):
+    """Добавляет тройку [сумма, количество, скетч] в словарь target по ключу key
+
+        Args:
+            target (dict): Ключ -> [сумма, количество, скетч], изменяется на месте
+            key (object): Ключ
+            stat (list): Сумма, количество и скетч
+            copy (bool): Копировать скетч stat, чтобы он не изменялся, False - для тройки, которая больше
+                не используется, она может попасть в target без копирования
+    """
+    stat_sum, stat_count, stat_sketch = stat
+    merged = target.get(key)
+    if merged is None:
+        target[key] = [stat_sum, stat_count, stat_sketch.copy() if copy else stat_sketch]
+    else:
+        merged[0] += stat_sum
+        merged[1] += stat_count
+        merged[2].merge(stat_sketch)
+
+def merge_stats(target, stats, copy=True):
+    """Добавляет тройки [сумма, количество, скетч] в словарь target
+
+        Args:
+            target (dict): Ключ -> [сумма, количество, скетч], изменяется на месте
+            stats (dict): Ключ -> [сумма, количество, скетч]
+            copy (bool): Копировать скетчи stats, см. merge_stat
+    """
+    for key, stat in stats.items():
+        merge_stat(target, key, stat, copy)
+
+def pack_stats(stats):
+    """Раскладывает словарь троек в параллельные массивы для компактной сериализации
+
+        Args:
+            stats (dict): Ключ -> [сумма, количество, скетч]
+
+        Returns:
+            tuple: Ключи, массив сумм, массив количеств, скетчи
+    """
+    return (list(stats), array('d', (stat[0] for stat in stats.values())),
+            array('q', (stat[1] for stat in stats.values())), [stat[2] for stat in stats.values()])
+
+def unpack_stats(packed):
+    """Собирает словарь троек из массивов pack_stats
+
+        Args:
+            packed (tuple): Результат pack_stats
+
+        Returns:
+            dict: Ключ -> [сумма, количество, скетч]
+    """
+    keys, sums, counts, sketches = packed
+    return {key: [stat_sum, stat_count, stat_sketch]
+            for key, stat_sum, stat_count, stat_sketch in zip(keys, sums, counts, sketches)}
+
+def pack_groups(groups):
+    """Раскладывает суммы и количества зарплат пар (название вакансии, город) в компактные массивы:
+    названия кодируются общим словарем, для каждого города хранятся массивы кодов названий, сумм и количеств,
+    поэтому запрос просматривает только группы своего города
+
+        Args:
+            groups (dict): Город -> {название: [сумма, количество]}
+
+        Returns:
+            (list, dict): Словарь названий и город -> (коды названий, суммы, количества)
+    >>> names, packed = pack_groups({"Москва": {"Java": [300.0, 2], "Python": [50.0, 1]}, "Казань": {"Java": [70.0, 1]}})
+    >>> names, [(city, codes.tolist(), counts.tolist()) for city, (codes, sums, counts) in packed.items()]
+    (['Java', 'Python'], [('Москва', [0, 1], [2, 1]), ('Казань', [0], [1])])
+    >>> unpack_groups(names, packed, unpack_groups(names, packed))["Москва"]
+    {'Java': [600.0, 4], 'Python': [100.0, 2]}
+    """
+    names = {}
+    packed = {}
+    for area_name, city_groups in groups.items():
+        packed[area_name] = (array('i', [names.setdefault(name, len(names)) for name in city_groups]),
+                             array('d', [group[0] for group in city_groups.values()]),
+                             array('q', [group[1] for group in city_groups.values()]))
+    return list(names), packed
+
+def count_groups(packed):
+    """Возвращает число пар (название вакансии, город) в массивах pack_groups
+
+        Args:
+            packed (dict): Город -> (коды названий, суммы, количества)
+
+        Returns:
+            int: Число пар
+    """
+    return sum(len(name_codes) for name_codes, sums, counts in packed.values())
+
+def unpack_groups(names, packed, groups=None):
+    """Добавляет суммы и количества из pack_groups в словарь групп
+
+        Args:
+            names (list): Словарь названий
+            packed (dict): Город -> (коды названий, суммы, количества)
+            groups (dict): Город -> {название: [сумма, количество]}, изменяется на месте, None - новый словарь
+
+        Returns:
+            dict: Город -> {название: [сумма, количество]}
+    """
+    groups = {} if groups is None else groups
+    for area_name, (name_codes, sums, counts) in packed.items():
+        city_groups = groups.setdefault(area_name, {})
+        for name_code, group_sum, group_count in zip(name_codes, sums, counts):
+            group = city_groups.get(names[name_code])
+            if group is None:
+                city_groups[names[name_code]] = [group_sum, group_count]
+            else:
+                group[0] += group_sum
+                group[1] += group_count
+    return groups
+
+class Aggregate:
+    """Объединяемые статистические данные для пары (профессия, город): сумма, количество и скетч зарплат
+    по годам и по городам. Объединение ассоциативно и стоит O(числа годов и городов), а не O(числа вакансий).
+    Количества вакансий совпадают с количествами зарплат, поэтому отдельно не хранятся
+
+        Attributes:
+            salary (dict): Год -> [сумма, количество, скетч] зарплат
+            salary_prof (dict): Год -> [сумма, количество, скетч] зарплат выбранной профессии
+            salary_city (dict): Город -> [сумма, количество, скетч] зарплат
+            city_order (dict): Город -> (год, номер) первого появления, задает порядок городов
+                независимо от порядка объединения
+            rows (int): Число вакансий
+    """
+    __slots__ = ("salary", "salary_prof", "salary_city", "city_order", "rows")
+
+    def __init__(self, rows=0):
+        """Инициализирует пустой агрегат
+
+            Args:
+                rows (int): Число вакансий
+        """
+        self.salary = {}
+        self.salary_prof = {}
+        self.salary_city = {}
+        self.city_order = {}
+        self.rows = rows
+
+    @classmethod
+    def from_year(cls, year, salary, salary_prof, cities_salary, rows=0):
+        """Создает агрегат одного года. Тройки не копируются и не изменяются при объединении
+
+            Args:
+                year (int): Год
+                salary (list): [сумма, количество, скетч] зарплат
+                salary_prof (list): [сумма, количество, скетч] зарплат выбранной профессии
+                cities_salary (dict): Город -> [сумма, количество, скетч] зарплат
+                rows (int): Число вакансий года
+
+            Returns:
+                Aggregate: Агрегат
+        """
+        aggregate = cls(rows)
+        aggregate.salary[year] = salary
+        aggregate.salary_prof[year] = salary_prof
+        aggregate.salary_city = cities_salary
+        aggregate.city_order = {city: (year or 0, index) for index, city in enumerate(cities_salary)}
+        return aggregate
+
+    def merge(self, other):
+        """Возвращает объединение двух агрегатов, исходные агрегаты не изменяются
+
+            Args:
+                other (Aggregate): Другой агрегат
+
+            Returns:
+                Aggregate: Объединенный агрегат
+        """
+        result = Aggregate(self.rows + other.rows)
+        for target, first, second in ((result.salary, self.salary, other.salary),
+                                      (result.salary_prof, self.salary_prof, other.salary_prof),
+                                      (result.salary_city, self.salary_city, other.salary_city)):
+            merge_stats(target, first)
+            merge_stats(target, second)
+        result.city_order = dict(self.city_order)
+        for city, order in other.city_order.items():
+            if city not in result.city_order or order < result.city_order[city]:
+                result.city_order[city] = order
+        return result
+
+    def to_data(self):
+        """Возвращает статистические данные в виде словаря для print_data: годы по возрастанию,
+        города в порядке первого появления
+
+            Returns:
+                dict: Статистические данные
+        """
+        years = sorted(self.salary)
+        cities = sorted(self.salary_city, key=self.city_order.__getitem__)
+        return {"salary": {year: self.salary[year] for year in years},
+                "amount": {year: self.salary[year][1] for year in years},
+                "salary_prof": {year: self.salary_prof[year] for year in years},
+                "amount_prof": {year: self.salary_prof[year][1] for year in years},
+                "salary_city": {city: self.salary_city[city] for city in cities},
+                "amount_city": {city: self.salary_city[city][1] for city in cities}}
+
+    def __getstate__(self):
+        return (self.rows, pack_stats(self.salary), pack_stats(self.salary_prof), pack_stats(self.salary_city),
+                self.city_order)
+
+    def __setstate__(self, state):
+        self.rows, salary, salary_prof, salary_city, self.city_order = state
+        self.salary = unpack_stats(salary)
+        self.salary_prof = unpack_stats(salary_prof)
+        self.salary_city = unpack_stats(salary_city)
+
+class BatchAggregate:
+    """Объединяемые статистические данные нескольких пар (профессия, город) одного прохода по файлам.
+    Агрегаты по городам и число вакансий не зависят от запроса, поэтому хранятся и объединяются один раз,
+    у каждой пары свои только зарплаты профессии по годам
+
+        Attributes:
+            common (Aggregate): Агрегаты по городам и число вакансий
+            salary_prof (list): Год -> [сумма, количество, скетч] зарплат профессии для каждой пары
+    >>> first = BatchAggregate.from_year(2020, [[300.0, 2, KLLSketch()], [0.0, 0, KLLSketch()]], {}, 5)
+    >>> second = BatchAggregate.from_year(2021, [[50.0, 1, KLLSketch()], [70.0, 1, KLLSketch()]], {}, 3)
+    >>> [(aggregate.rows, aggregate.to_data()["amount_prof"]) for aggregate in first.merge(second).aggregates()]
+    [(8, {2020: 2, 2021: 1}), (8, {2020: 0, 2021: 1})]
+    """
+    __slots__ = ("common", "salary_prof")
+
+    def __init__(self, queries=0, rows=0):
+        """Инициализирует пустой агрегат
+
+            Args:
+                queries (int): Число пар (профессия, город)
+                rows (int): Число вакансий
+        """
+        self.common = Aggregate(rows)
+        self.salary_prof = [{} for query in range(queries)]
+
+    @property
+    def rows(self):
+        return self.common.rows
+
+    @classmethod
+    def from_year(cls, year, salaries, cities_salary, rows=0):
+        """Создает агрегат одного года. Тройки не копируются и не изменяются при объединении
+
+            Args:
+                year (int): Год
+                salaries (list): [сумма, количество, скетч] зарплат профессии для каждой пары
+                cities_salary (dict): Город -> [сумма, количество, скетч] зарплат
+                rows (int): Число вакансий года
+
+            Returns:
+                BatchAggregate: Агрегат
+        """
+        batch = cls(0, rows)
+        batch.common.salary_city = cities_salary
+        batch.common.city_order = {city: (year or 0, index) for index, city in enumerate(cities_salary)}
+        batch.salary_prof = [{year: salary} for salary in salaries]
+        return batch
+
+    def merge(self, other):
+        """Возвращает объединение двух агрегатов, исходные агрегаты не изменяются
+
+            Args:
+                other (BatchAggregate): Другой агрегат
+
+            Returns:
+                BatchAggregate: Объединенный агрегат
+        """
+        result = BatchAggregate()
+        result.common = self.common.merge(other.common)
+        for first, second in zip(self.salary_prof, other.salary_prof):
+            merged = {}
+            merge_stats(merged, first)
+            merge_stats(merged, second)
+            result.salary_prof.append(merged)
+        return result
+
+    def aggregates(self):
+        """Возвращает агрегат каждой пары, агрегаты по городам у них общие и не копируются
+
+            Returns:
+                list: Агрегаты в порядке пар
+        """
+        result = []
+        for salary_prof in self.salary_prof:
+            aggregate = Aggregate(self.common.rows)
+            aggregate.salary = salary_prof
+            aggregate.salary_prof = salary_prof
+            aggregate.salary_city = self.common.salary_city
+            aggregate.city_order = self.common.city_order
+            result.append(aggregate)
+        return result
+
+def tree_reduce(aggregates):
+    """Объединяет агрегаты попарно по уровням дерева, глубина объединения log2(n)
+
+        Args:
+            aggregates (iterable): Агрегаты
+
+        Returns:
+            Aggregate: Объединенный агрегат
+    """
+    level = list(aggregates)
+    if not level:
+        return Aggregate()
+    while len(level) > 1:
+        level = [level[i].merge(level[i + 1]) if i + 1 < len(level) else level[i] for i in range(0, len(level), 2)]
+    return level[0]
@@ -0,0 +1,144 @@
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import chuncker
+import main
+import pdf
+from cache import AggregateCache
+
+SCALES = {"100k": 100000, "1M": 1000000, "10M": 10000000}
+
+CITIES = ["Москва", "Санкт-Петербург", "Новосибирск", "Екатеринбург", "Казань", "Нижний Новгород",
+          "Краснодар", "Самара", "Ростов-на-Дону", "Воронеж", "Пермь", "Уфа", "Челябинск", "Омск",
+          "Красноярск", "Тюмень", "Минск", "Алматы", "Киев", "Ташкент"]
+PROFESSIONS = ["Программист", "Аналитик", "Менеджер по продажам", "Бухгалтер", "Тестировщик",
+               "Системный администратор", "Дизайнер", "Водитель", "Инженер", "Оператор call-центра"]
+LEVELS = ["", "Младший ", "Старший ", "Ведущий ", "Главный "]
+STACKS = ["", " Python", " Java", " 1С", ", удаленно", " (C#, .NET)"]
+
+def generate(file_name, rows, seed=0):
+    """Создает csv файл со случайными вакансиями в формате выгрузки hh.ru.
+    Города распределены по закону Ципфа, число вакансий растет к последним годам,
+    зарплаты распределены логнормально, часть зарплат пустая
+
+        Args:
+            file_name (str): Название файла
+            rows (int): Число вакансий
+            seed (int): Зерно генератора, при одинаковом зерне файлы совпадают
+    """
+    rnd = random.Random(seed)
+    city_weights = [1 / (rank + 1) for rank in range(len(CITIES))]
+    city_weights[0] *= 4
+    years = list(range(2003, 2023))
+    year_weights = [1.2 ** i for i in range(len(years))]
+    with open(file_name, 'w', encoding="utf-8-sig", newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(["name", "salary", "area_name", "published_at"])
+        for city, year in zip(rnd.choices(CITIES, city_weights, k=rows), rnd.choices(years, year_weights, k=rows)):
+            name = rnd.choice(LEVELS) + rnd.choice(PROFESSIONS) + rnd.choice(STACKS)
+            salary = "" if rnd.random() < 0.15 else str(round(rnd.lognormvariate(11, 0.6) * (1 + (year - 2003) / 20)))
+            published_at = "%d-%02d-%02dT%02d:%02d:%02d+0300" % (year, rnd.randint(1, 12), rnd.randint(1, 28),
+                                                                rnd.randint(0, 23), rnd.randint(0, 59),
+                                                                rnd.randint(0, 59))
+            writer.writerow([name, salary, city, published_at])
+
+def git_version():
+    """Возвращает текущий коммит репозитория или None, если git недоступен
+    """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(rows, work_dir, prof_name="Программист", city_name="Москва", seed=0, pdf_backend="auto", mode="thread"):
+    """Генерирует данные и замеряет время каждого этапа обработки: разбивки на csv и колоночные чанки,
+    исходного чтения с DataWorker.get_data (по одному году, чтобы в памяти были вакансии только одного года)
+    и collect_data с теми движками, которые использует main.py
+
+        Args:
+            rows (int): Число вакансий
+            work_dir (str): Папка для входного файла и чанков
+            prof_name (str): Имя профессии для запроса
+            city_name (str): Имя города для запроса
+            seed (int): Зерно генератора
+            pdf_backend (str): Способ сохранения PDF для PdfRenderer
+            mode (str): "thread" - пул потоков, "process" - пул процессов для collect_data
+
+        Returns:
+            dict: Время этапов в секундах
+    """
+    file_name = os.path.join(work_dir, "vacancies_%d.csv" % rows)
+    chunks_dir = os.path.join(work_dir, "csv_%d" % rows)
+    columnar_dir = os.path.join(work_dir, "columnar_%d" % rows)
+    cache_dir = os.path.join(work_dir, "cache_%d" % rows)
+    if not os.path.exists(file_name):
+        generate(file_name, rows, seed)
+    for directory in (chunks_dir, columnar_dir, cache_dir):
+        shutil.rmtree(directory, ignore_errors=True)
+    stages = {}
+
+    def stage(name, function, *args, **kwargs):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = function(*args, **kwargs)
+        stages[name] = stages.get(name, 0.0) + time.perf_counter() - start
+        return result
+
+    stage("chunking", chuncker.сsv_chuncker, file_name, chunks_dir)
+    stage("chunking_columnar", chuncker.сsv_chuncker, file_name, columnar_dir, fmt="columnar")
+    file_names = sorted(main.chunks(chunks_dir))
+    columnar_names = sorted(main.chunks(columnar_dir, "columnar"))
+    for name in file_names:
+        year = stage("reading", main.CSVReader().get_vacancies, name)
+        stage("get_data", main.DataWorker().get_data, prof_name, year, city_name)
+    engines = {"python": (file_names, "python", None), "numpy": (file_names, "numpy", None),
+               "columnar": (columnar_names, "numpy", None),
+               "cache_cold": (file_names, "python", AggregateCache(cache_dir)),
+               "cache_warm": (file_names, "python", AggregateCache(cache_dir))}
+    for engine, (names, engine_name, cache) in engines.items():
+        data, total_vacancies = stage("collect_" + engine, main.collect_data, names, prof_name, city_name, mode,
+                                      engine_name, cache)
+    dicts = stage("print_data", main.print_data, data, total_vacancies)
+    report = stage("graph", main.Report, "graph.jpg", dicts, prof_name, city_name)
+    renderer = pdf.PdfRenderer(pdf_backend)
+    stage("pdf", renderer.render, report, os.path.join(work_dir, "report.pdf"))
+    return {"rows": rows, "mode": mode, "pdf_backend": renderer.backend, "stages": stages}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк обработки вакансий на синтетических данных")
+    parser.add_argument("--scale", nargs="+", default=["100k"],
+                        help="размеры данных: " + ", ".join(SCALES) + " или число вакансий")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pdf-backend", choices=["auto", "wkhtmltopdf", "matplotlib"], default="auto")
+    parser.add_argument("--mode", choices=["thread", "process"], default="thread", help="пул для collect_data")
+    parser.add_argument("--work-dir", help="папка для сгенерированных файлов, по умолчанию временная")
+    parser.add_argument("--output", default="bench_output.json", help="json файл с результатами")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="vacancies_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    results = []
+    for scale in args.scale:
+        result = run(SCALES[scale] if scale in SCALES else int(scale), work_dir, seed=args.seed,
+                     pdf_backend=args.pdf_backend, mode=args.mode)
+        print(result)
+        results.append(result)
+    with open(args.output, 'w', encoding="utf-8") as f:
+        json.dump({"version": git_version(), "python": platform.python_version(),
+                   "date": datetime.now().isoformat(timespec="seconds"), "seed": args.seed,
+                   "results": results}, f, ensure_ascii=False, indent=2)
+    if args.work_dir is None:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,127 @@
+import hashlib
+import os
+import pickle
+
+CACHE_VERSION = 1
+
+class AggregateCache:
+    """Дисковый кэш агрегатов годовых чанков с вытеснением давно неиспользуемых записей (LRU)
+
+        Attributes:
+            directory (str): Папка кэша
+            max_bytes (int): Максимальный суммарный размер записей в байтах
+            hash_content (bool): Ключ по хэшу содержимого файла вместо размера и времени изменения
+    """
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, hash_content=True):
+        """Инициализирует объект AggregateCache и создает папку кэша
+
+            Args:
+                directory (str): Папка кэша
+                max_bytes (int): Максимальный суммарный размер записей в байтах
+                hash_content (bool): Ключ по хэшу содержимого файла вместо размера и времени изменения.
+                    Хэш запоминается в кэше по пути, размеру и времени изменения, поэтому неизменившийся файл
+                    читается для хэширования один раз, а переписанный разбивкой файл с тем же содержимым
+                    получает тот же ключ
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hash_content = hash_content
+        os.makedirs(directory, exist_ok=True)
+
+    def fingerprint(self, file_name, *params):
+        """Возвращает ключ кэша для файла
+
+            Args:
+                file_name (str): Название файла или папки чанка в колоночном формате
+                params: Дополнительные параметры, влияющие на агрегаты
+
+            Returns:
+                tuple: Ключ кэша
+        """
+        if os.path.isdir(file_name):
+            paths = sorted(os.path.join(file_name, name) for name in os.listdir(file_name))
+        else:
+            paths = [file_name]
+        stats = [os.stat(file_path) for file_path in paths]
+        size = sum(stat.st_size for stat in stats)
+        stat_key = (CACHE_VERSION, os.path.abspath(file_name), size, max(stat.st_mtime_ns for stat in stats))
+        if not self.hash_content:
+            return stat_key + params
+        digest_key = stat_key + ("digest",)
+        content_digest = self.get(digest_key)
+        if content_digest is None:
+            digest = hashlib.blake2b()
+            for file_path in paths:
+                digest.update(os.path.basename(file_path).encode("utf-8"))
+                with open(file_path, 'rb') as f:
+                    for block in iter(lambda: f.read(1024 * 1024), b''):
+                        digest.update(block)
+            content_digest = digest.hexdigest()
+            self.put(digest_key, content_digest)
+        return (CACHE_VERSION, size, content_digest) + params
+
+    def path(self, key):
+        """Возвращает путь до файла записи по ключу
+
+            Args:
+                key (tuple): Ключ кэша
+
+            Returns:
+                str: Путь до файла записи
+        """
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode("utf-8")).hexdigest() + ".pickle")
+
+    def get(self, key):
+        """Возвращает запись по ключу и отмечает ее как недавно использованную
+
+            Args:
+                key (tuple): Ключ кэша
+
+            Returns:
+                object: Запись или None, если ее нет в кэше
+        """
+        entry_path = self.path(key)
+        try:
+            with open(entry_path, 'rb') as f:
+                stored_key, value = pickle.load(f)
+            os.utime(entry_path)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        return value if stored_key == key else None
+
+    def put(self, key, value):
+        """Сохраняет запись и вытесняет самые старые записи при превышении размера кэша
+
+            Args:
+                key (tuple): Ключ кэша
+                value (object): Запись
+        """
+        entry_path = self.path(key)
+        temp_path = entry_path + "." + str(os.getpid()) + ".tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, entry_path)
+        self.evict()
+
+    def evict(self):
+        """Удаляет давно неиспользуемые записи, пока размер кэша больше max_bytes
+        """
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".pickle"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            total += stat.st_size
+        for mtime, size, entry_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -1,27 +1,705 @@
-def write_chunk(file_name, lines, header):
-    """Сохраняет файл в виде csv файла 
-        Args:
-            file_name (str): Название файла
-            fields (str): Поля csv файла
-            lines (str): Вакансии через \n
-    """
-    print("Saving", file_name)
-    with open('csv//vacancies_'+ file_name +'.csv', 'w', encoding="utf-8-sig") as f_out:
-        f_out.write(header)
-        f_out.writelines(lines)
-        f_out.close()
-
-def сsv_chuncker(file_name):
-    dictionary = {}
-    with open(file_name, 'r', encoding="utf-8-sig") as f:
-        header = f.readline()
-        for x in f:
-            listLine = x.split(",")
-            year = listLine[-1].split('-')[0]
-            if (year in dictionary.keys()):
-                dictionary[year].append(x)
+import bz2
+import collections
+import concurrent.futures
+import contextlib
+import csv
+import gzip
+import io
+import itertools
+import json
+import lzma
+import os
+import shutil
+import sys
+import tempfile
+from array import array
+
+import dedup
+from currency import month_number
+
+BUFFER_SIZE = 1024 * 1024
+COLUMNAR_SUFFIX = ".col"
+# Минимальный размер диапазона байтов для одного процесса параллельной разбивки
+MIN_RANGE_SIZE = 8 * 1024 * 1024
+# Модули сжатия по расширению файла: каждый умеет читать файл из нескольких независимо сжатых частей
+COMPRESSORS = {".gz": gzip, ".xz": lzma, ".bz2": bz2}
+BLOCKS_SUFFIX = ".blocks.json"
+# Число потоков распаковки блоков сжатого чанка: zlib, lzma и bz2 отпускают GIL во время распаковки
+DECOMPRESS_WORKERS = 4
+
+def compressor(file_name):
+    """Возвращает модуль сжатия по расширению файла
+
+        Args:
+            file_name (str): Название файла
+
+        Returns:
+            module: gzip, lzma, bz2 или None для несжатого файла
+    """
+    return COMPRESSORS.get(os.path.splitext(file_name)[1])
+
+@contextlib.contextmanager
+def open_text(file_name, offset=0):
+    """Открывает csv файл на потоковое чтение текста, сжатые файлы (.gz, .xz, .bz2) распаковываются на лету
+
+        Args:
+            file_name (str): Название файла
+            offset (int): Смещение в байтах файла на диске, для сжатого файла - начало сжатой части
+
+        Yields:
+            io.TextIOBase: Текст файла
+    """
+    module = compressor(file_name)
+    with open(file_name, 'rb') as raw:
+        raw.seek(offset)
+        stream = raw if module is None else module.open(raw, 'rb')
+        with io.TextIOWrapper(stream, encoding="utf-8-sig", newline='') as text:
+            yield text
+
+def read_fields(file_name):
+    """Считывает поля csv файла, в том числе сжатого
+
+        Args:
+            file_name (str): Название файла
+
+        Returns:
+            list: Поля csv файла
+    """
+    with open_text(file_name) as f:
+        return next(csv.reader(f), [])
+
+def read_blocks(file_name):
+    """Загружает индекс блоков сжатого чанка
+
+        Args:
+            file_name (str): Название файла чанка
+
+        Returns:
+            list: Пары (смещение блока в байтах, число вакансий в блоке) или None, если индекса нет
+    """
+    blocks_path = file_name + BLOCKS_SUFFIX
+    if not os.path.exists(blocks_path):
+        return None
+    with open(blocks_path, encoding="utf-8") as f:
+        return json.load(f)["blocks"]
+
+def iter_blocks(file_name, blocks, offset=0, workers=DECOMPRESS_WORKERS):
+    """Распаковывает части сжатого чанка в пуле потоков с опережением на workers частей
+
+        Args:
+            file_name (str): Название файла чанка
+            blocks (list): Индекс блоков из read_blocks
+            offset (int): Смещение в байтах файла на диске (0 - с заголовка)
+            workers (int): Число потоков распаковки
+
+        Yields:
+            str: Текст частей по порядку
+    """
+    size = os.path.getsize(file_name)
+    starts = ([0] if offset == 0 else []) + [start for start, rows in blocks if start >= offset]
+    decompress = compressor(file_name).decompress
+    with open(file_name, 'rb') as f, concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        for start, end in zip(starts, starts[1:] + [size]):
+            f.seek(start)
+            pending.append(executor.submit(decompress, f.read(end - start)))
+            if len(pending) >= workers:
+                yield pending.popleft().result().decode("utf-8-sig")
+        while pending:
+            yield pending.popleft().result().decode("utf-8-sig")
+
+@contextlib.contextmanager
+def open_lines(file_name, offset=0, workers=DECOMPRESS_WORKERS):
+    """Открывает csv файл на построчное чтение начиная с offset. Блоки сжатого чанка с индексом
+    распаковываются параллельно через iter_blocks, остальные файлы читаются потоково через open_text
+
+        Args:
+            file_name (str): Название файла
+            offset (int): Смещение в байтах файла на диске (0 - с заголовка)
+            workers (int): Число потоков распаковки
+
+        Yields:
+            iterable: Строки файла
+    """
+    blocks = read_blocks(file_name) if compressor(file_name) is not None else None
+    if blocks is None:
+        with open_text(file_name, offset) as f:
+            yield f
+        return
+    texts = iter_blocks(file_name, blocks, offset, workers)
+    try:
+        yield itertools.chain.from_iterable(io.StringIO(text, newline='') for text in texts)
+    finally:
+        texts.close()
+
+class CsvChunk:
+    """Годовой чанк в виде csv файла с буферизованной записью
+    """
+    def __init__(self, file_name, header, buffer_size=BUFFER_SIZE, append=False):
+        """Открывает файл чанка на запись и записывает в него заголовок.
+        В режиме дозаписи новые вакансии добавляются в конец существующего файла
+
+            Args:
+                file_name (str): Название файла
+                header (list): Поля csv файла
+                buffer_size (int): Размер буфера записи в байтах, при заполнении буфер сбрасывается на диск
+                append (bool): Дописывать в существующий файл
+        """
+        self.path = file_name
+        self.offset = 0
+        if append and os.path.exists(file_name) and os.path.getsize(file_name) > 0:
+            if read_fields(file_name) != header:
+                raise ValueError("Поля файла не совпадают с полями чанка " + file_name)
+            self.offset = os.path.getsize(file_name)
+            self.file = open(file_name, 'a', encoding="utf-8-sig", newline='', buffering=buffer_size)
+            self.writer = csv.writer(self.file, lineterminator='\n')
+        else:
+            self.file = open(file_name, 'w', encoding="utf-8-sig", newline='', buffering=buffer_size)
+            self.writer = csv.writer(self.file, lineterminator='\n')
+            self.writer.writerow(header)
+
+    def writerow(self, row):
+        """Записывает вакансию в чанк
+
+            Args:
+                row (list): Вакансия в виде list
+        """
+        self.writer.writerow(row)
+
+    def extend(self, part_path):
+        """Дописывает в чанк вакансии части чанка из chunk_range. Байты копируются без разбора csv
+
+            Args:
+                part_path (str): Файл части чанка
+        """
+        self.file.flush()
+        with open(part_path, 'rb') as part:
+            part.readline()
+            shutil.copyfileobj(part, self.file.buffer, BUFFER_SIZE)
+
+    def close(self):
+        """Сбрасывает буфер и закрывает файл чанка
+        """
+        self.file.close()
+
+class CompressedCsvChunk:
+    """Годовой чанк в виде сжатого csv файла из независимо сжатых частей: заголовок и блоки вакансий
+    примерно по buffer_size символов. Файл целиком читается обычным gzip/lzma/bz2, а индекс блоков
+    (файл чанка + BLOCKS_SUFFIX) позволяет распаковывать блоки параллельно и читать только дописанные блоки
+
+        Attributes:
+            path (str): Файл чанка
+            offset (int): Размер файла чанка в байтах до дозаписи
+            blocks (list): Пары (смещение блока в байтах, число вакансий в блоке)
+    """
+    def __init__(self, file_name, header, buffer_size=BUFFER_SIZE, append=False):
+        """Открывает файл чанка на запись и записывает в него заголовок отдельной сжатой частью.
+        В режиме дозаписи новые блоки добавляются в конец существующего файла
+
+            Args:
+                file_name (str): Название файла с расширением .gz, .xz или .bz2
+                header (list): Поля csv файла
+                buffer_size (int): Размер блока вакансий в символах до сжатия
+                append (bool): Дописывать в существующий файл
+        """
+        self.path = file_name
+        self.offset = 0
+        self.compressor = compressor(file_name)
+        if self.compressor is None:
+            raise ValueError("Неизвестное сжатие чанка: " + file_name)
+        self.buffer_size = buffer_size
+        self.block = io.StringIO()
+        self.block_rows = 0
+        self.writer = csv.writer(self.block, lineterminator='\n')
+        if append and os.path.exists(file_name) and os.path.getsize(file_name) > 0:
+            if read_fields(file_name) != header:
+                raise ValueError("Поля файла не совпадают с полями чанка " + file_name)
+            self.offset = os.path.getsize(file_name)
+            self.blocks = read_blocks(file_name) or []
+            self.file = open(file_name, 'ab')
+        else:
+            self.blocks = []
+            self.file = open(file_name, 'wb')
+            self.writer.writerow(header)
+            self.file.write(self.compressor.compress(self.block.getvalue().encode("utf-8-sig")))
+            self.block = io.StringIO()
+            self.writer = csv.writer(self.block, lineterminator='\n')
+
+    def writerow(self, row):
+        """Записывает вакансию в текущий блок, заполненный блок сжимается и записывается на диск
+
+            Args:
+                row (list): Вакансия в виде list
+        """
+        self.writer.writerow(row)
+        self.block_rows += 1
+        if self.block.tell() >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Сжимает текущий блок отдельной частью и записывает его на диск
+        """
+        if not self.block_rows:
+            return
+        self.blocks.append([self.file.tell(), self.block_rows])
+        self.file.write(self.compressor.compress(self.block.getvalue().encode("utf-8")))
+        self.block.seek(0)
+        self.block.truncate()
+        self.block_rows = 0
+
+    def extend(self, part_path):
+        """Дописывает в чанк блоки части чанка из chunk_range. Сжатые блоки копируются без распаковки
+
+            Args:
+                part_path (str): Файл части чанка
+        """
+        self.flush()
+        blocks = read_blocks(part_path) or []
+        if not blocks:
+            return
+        start = blocks[0][0]
+        position = self.file.tell()
+        self.blocks.extend([offset - start + position, rows] for offset, rows in blocks)
+        with open(part_path, 'rb') as part:
+            part.seek(start)
+            shutil.copyfileobj(part, self.file, BUFFER_SIZE)
+
+    def close(self):
+        """Записывает последний блок, закрывает файл чанка и сохраняет индекс блоков
+        """
+        self.flush()
+        self.file.close()
+        with open(self.path + BLOCKS_SUFFIX, 'w', encoding="utf-8") as f_out:
+            json.dump({"blocks": self.blocks}, f_out)
+
+class ColumnarChunk:
+    """Годовой чанк в бинарном колоночном формате: папка с файлами колонок
+    salary.f8 (float64, NaN для пустых), area_name.i4, name.i4, salary_currency.i4 и experience_id.i4
+    (коды словарей), published_month.i4 (номер месяца публикации по локальной дате
+    из currency.month_number, -1 для пустой даты), meta.json со словарями
+    и триграммный индекс названий (файлы сегментов name_index.INDEX_FILES, границы сегментов - в meta.json)
+
+        Attributes:
+            path (str): Папка чанка
+            rows (int): Число вакансий в чанке
+            offset (int): Число вакансий в чанке до дозаписи
+            name_offset (int): Число названий в словаре до дозаписи
+            index_segments (list): Границы сегментов индекса названий до дозаписи или None, если индекса нет
+    """
+    columns = {"salary": "d", "area_name": "i", "name": "i", "published_month": "i",
+               "salary_currency": "i", "experience_id": "i"}
+    extensions = {"salary": ".f8", "area_name": ".i4", "name": ".i4",
+                  "published_month": ".i4", "salary_currency": ".i4", "experience_id": ".i4"}
+
+    def __init__(self, directory, header, buffer_size=BUFFER_SIZE, append=False, build_index=True):
+        """Создает папку чанка и открывает файлы колонок на запись.
+        В режиме дозаписи словари загружаются из meta.json, а колонки дописываются в конец
+
+            Args:
+                directory (str): Папка чанка
+                header (list): Поля csv файла
+                buffer_size (int): Размер буфера одной колонки в байтах
+                append (bool): Дописывать в существующий чанк
+                build_index (bool): Строить триграммный индекс названий при закрытии
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.path = directory
+        self.build_index = build_index
+        self.buffer_rows = max(1, buffer_size // 8)
+        self.indexes = {field: header.index(field) if field in header else None for field in ("published_at", *self.columns)}
+        self.values = {field: array(code) for field, code in self.columns.items()}
+        self.area_names = {}
+        self.names = {}
+        self.currencies = {}
+        self.experiences = {}
+        self.year = None
+        self.rows = 0
+        self.index_segments = None
+        meta_path = os.path.join(directory, "meta.json")
+        if append and os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            self.area_names = {area_name: code for code, area_name in enumerate(meta["area_names"])}
+            self.names = {name: code for code, name in enumerate(meta["names"])}
+            self.currencies = {currency: code for code, currency in enumerate(meta["currencies"])}
+            self.experiences = {experience: code for code, experience in enumerate(meta["experiences"])}
+            self.year = meta["year"]
+            self.rows = meta["rows"]
+            self.index_segments = meta.get("name_index")
+        self.offset = self.rows
+        self.name_offset = len(self.names)
+        self.files = {field: open(os.path.join(directory, field + self.extensions[field]), 'ab' if self.rows else 'wb')
+                      for field in self.columns}
+
+    def field(self, row, field):
+        """Возвращает значение поля вакансии или пустую строку, если поля нет в файле
+
+            Args:
+                row (list): Вакансия в виде list
+                field (str): Название поля
+
+            Returns:
+                str: Значение поля
+        """
+        index = self.indexes[field]
+        return row[index] if index is not None else ""
+
+    def writerow(self, row):
+        """Кодирует вакансию и добавляет ее в буферы колонок
+
+            Args:
+                row (list): Вакансия в виде list
+        """
+        salary = self.field(row, "salary")
+        published_at = self.field(row, "published_at")
+        self.values["salary"].append(float(salary) if salary != "" else float("nan"))
+        self.values["area_name"].append(self.area_names.setdefault(self.field(row, "area_name"), len(self.area_names)))
+        self.values["name"].append(self.names.setdefault(self.field(row, "name"), len(self.names)))
+        self.values["salary_currency"].append(self.currencies.setdefault(self.field(row, "salary_currency"),
+                                                                         len(self.currencies)))
+        self.values["experience_id"].append(self.experiences.setdefault(self.field(row, "experience_id"),
+                                                                        len(self.experiences)))
+        self.values["published_month"].append(month_number(published_at) if published_at else -1)
+        if published_at:
+            self.year = int(published_at.split("-")[0])
+        self.rows += 1
+        if len(self.values["salary"]) >= self.buffer_rows:
+            self.flush()
+
+    def extend(self, part_dir):
+        """Дописывает в чанк вакансии части чанка из chunk_range. Числовые колонки копируются как есть,
+        коды словарей перекодируются в словари чанка
+
+            Args:
+                part_dir (str): Папка части чанка
+        """
+        import numpy as np
+        self.flush()
+        with open(os.path.join(part_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        dictionaries = {"area_name": (self.area_names, meta["area_names"]), "name": (self.names, meta["names"]),
+                        "salary_currency": (self.currencies, meta["currencies"]),
+                        "experience_id": (self.experiences, meta["experiences"])}
+        for field in self.columns:
+            part_path = os.path.join(part_dir, field + self.extensions[field])
+            if field in dictionaries:
+                mapping, values = dictionaries[field]
+                codes = np.array([mapping.setdefault(value, len(mapping)) for value in values], dtype=np.int32)
+                codes[np.fromfile(part_path, dtype=np.int32)].tofile(self.files[field])
             else:
-                dictionary[year] = [x]
+                with open(part_path, 'rb') as part:
+                    shutil.copyfileobj(part, self.files[field], BUFFER_SIZE)
+        if meta["year"] is not None:
+            self.year = meta["year"]
+        self.rows += meta["rows"]
+
+    def flush(self):
+        """Сбрасывает буферы колонок на диск
+        """
+        for field, values in self.values.items():
+            values.tofile(self.files[field])
+            del values[:]
+
+    def close(self):
+        """Сбрасывает буферы, закрывает файлы колонок, дополняет триграммный индекс названий вакансий
+        сегментом по дописанным строкам и сохраняет словари и границы сегментов индекса в meta.json.
+        Если у чанка не было индекса, он строится по всем строкам
+        """
+        self.flush()
+        for f_out in self.files.values():
+            f_out.close()
+        meta = {"year": self.year, "rows": self.rows, "byteorder": sys.byteorder,
+                "area_names": list(self.area_names), "names": list(self.names), "currencies": list(self.currencies),
+                "experiences": list(self.experiences)}
+        if self.build_index:
+            import numpy as np
+            from name_index import NameIndex
+            name_codes = np.memmap(os.path.join(self.path, "name" + self.extensions["name"]), dtype=np.int32,
+                                   mode='r', shape=(self.rows,)) if self.rows else np.empty(0, dtype=np.int32)
+            if self.index_segments is None:
+                meta["name_index"] = NameIndex.append(self.path, meta["names"], name_codes, [], 0, 0)
+            else:
+                meta["name_index"] = NameIndex.append(self.path, meta["names"], name_codes, self.index_segments,
+                                                      self.name_offset, self.offset)
+        with open(os.path.join(self.path, "meta.json"), 'w', encoding="utf-8") as f_out:
+            json.dump(meta, f_out, ensure_ascii=False)
+
+def open_chunk(year, header, out_dir="csv", buffer_size=BUFFER_SIZE, fmt="csv", append=False, part=False,
+               compression=""):
+    """Открывает годовой чанк на запись
+
+        Args:
+            year (str): Год вакансий чанка
+            header (list): Поля csv файла
+            out_dir (str): Папка для чанков
+            buffer_size (int): Размер буфера записи в байтах, при заполнении буфер сбрасывается на диск
+            fmt (str): "csv" - csv файл, "columnar" - бинарный колоночный формат
+            append (bool): Дописывать в существующий чанк
+            part (bool): Временная часть чанка для параллельной разбивки: без сообщения и без индекса названий
+            compression (str): Расширение сжатия csv чанка (".gz", ".xz", ".bz2"), "" - без сжатия
+
+        Returns:
+            CsvChunk | CompressedCsvChunk | ColumnarChunk: Открытый чанк
+    """
+    if compression and (fmt != "csv" or compression not in COMPRESSORS):
+        raise ValueError("Сжатие " + compression + " не поддерживается для формата " + fmt)
+    if not part:
+        print("Saving", year, file=sys.stderr)
+    if fmt == "columnar":
+        return ColumnarChunk(os.path.join(out_dir, 'vacancies_' + year + COLUMNAR_SUFFIX), header, buffer_size, append,
+                             build_index=not part)
+    if fmt == "csv" and compression:
+        return CompressedCsvChunk(os.path.join(out_dir, 'vacancies_' + year + '.csv' + compression), header,
+                                  buffer_size, append)
+    if fmt == "csv":
+        return CsvChunk(os.path.join(out_dir, 'vacancies_' + year + '.csv'), header, buffer_size, append)
+    raise ValueError("Неизвестный формат чанков: " + fmt)
 
-        for data in dictionary:
-            write_chunk(data, dictionary[data], header)
\ No newline at end of file
+def partition(reader, header, chunks, open_year, seen=None, skip_duplicates=True):
+    """Раскладывает вакансии по годовым чанкам, чанк года открывается при первой вакансии года
+
+        Args:
+            reader (iterable): Вакансии в виде list
+            header (list): Поля csv файла
+            chunks (dict): Год -> открытый чанк, дополняется новыми годами
+            open_year (callable): Открывает чанк по году
+            seen (Deduplicator): Отпечатки уже записанных вакансий, дополняется отпечатками новых, None - без фильтра
+            skip_duplicates (bool): Пропускать вакансии, отпечатки которых уже есть в seen
+    """
+    date_index = header.index("published_at") if "published_at" in header else -1
+    indexes = dedup.fingerprint_indexes(header)
+    for row in reader:
+        if not row:
+            continue
+        if seen is not None and not seen.add(dedup.fingerprint(row, indexes)) and skip_duplicates:
+            continue
+        year = row[date_index].split('-')[0]
+        if year not in chunks:
+            chunks[year] = open_year(year)
+        chunks[year].writerow(row)
+
+def read_header(file_name):
+    """Считывает заголовок csv файла
+
+        Args:
+            file_name (str): Название файла
+
+        Returns:
+            (list, int): Поля csv файла и смещение первой вакансии в байтах
+    """
+    with open(file_name, 'rb') as f:
+        line = f.readline()
+    return next(csv.reader([line.decode("utf-8-sig")]), []), len(line)
+
+def split_ranges(file_name, start, parts, block_size=BUFFER_SIZE):
+    """Делит файл начиная с байта start на parts диапазонов примерно равного размера.
+    Границы ставятся только после переводов строк вне кавычек: четность кавычек считается по всему файлу
+    через bytes.count, поэтому поиск границ идет со скоростью чтения диска, а не разбора csv
+
+        Args:
+            file_name (str): Название файла
+            start (int): Смещение первой вакансии в байтах
+            parts (int): Желаемое число диапазонов
+            block_size (int): Размер блока чтения в байтах
+
+        Returns:
+            list: Пары (начало, конец) непустых диапазонов байтов
+    >>> import tempfile
+    >>> with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as f:
+    ...     _ = f.write(b'name\\n"a\\nb"\\nc\\nd\\n')
+    >>> split_ranges(f.name, 5, 3, block_size=4)
+    [(5, 11), (11, 13), (13, 15)]
+    """
+    size = os.path.getsize(file_name)
+    goals = iter([start + (size - start) * number // parts for number in range(1, parts)])
+    goal = next(goals, None)
+    bounds = [start]
+    quoted = False
+    with open(file_name, 'rb') as f:
+        f.seek(start)
+        position = start
+        while goal is not None:
+            block = f.read(block_size)
+            if not block:
+                break
+            end = position + len(block)
+            index = 0
+            while goal is not None and goal < end:
+                newline = block.find(b'\n', max(goal - position, index))
+                if newline < 0:
+                    break
+                quoted ^= block.count(b'"', index, newline) % 2 == 1
+                index = newline + 1
+                if not quoted:
+                    bounds.append(position + index)
+                    while goal is not None and goal < bounds[-1]:
+                        goal = next(goals, None)
+            quoted ^= block.count(b'"', index) % 2 == 1
+            position = end
+    bounds.append(size)
+    return [(first, last) for first, last in zip(bounds, bounds[1:]) if first < last]
+
+def read_range(file_name, start, end):
+    """Построчно читает диапазон байтов файла, начало и конец диапазона совпадают с началами строк
+
+        Args:
+            file_name (str): Название файла
+            start (int): Начало диапазона
+            end (int): Конец диапазона
+
+        Returns:
+            generator: Строки диапазона
+    """
+    with open(file_name, 'rb') as f:
+        f.seek(start)
+        position = start
+        for line in f:
+            if position >= end:
+                break
+            position += len(line)
+            yield line.decode("utf-8")
+
+def chunk_range(file_name, start, end, header, out_dir, buffer_size=BUFFER_SIZE, fmt="csv", compression=""):
+    """Разбивает по годам диапазон байтов файла на части чанков в отдельной папке
+
+        Args:
+            file_name (str): Название файла
+            start (int): Начало диапазона из split_ranges
+            end (int): Конец диапазона из split_ranges
+            header (list): Поля csv файла
+            out_dir (str): Папка для частей чанков
+            buffer_size (int): Размер буфера записи одного года в байтах
+            fmt (str): "csv" - csv файлы, "columnar" - бинарный колоночный формат
+            compression (str): Расширение сжатия csv чанков, части сжимаются в процессе разбивки
+
+        Returns:
+            dict: Год -> путь до части чанка, в порядке первого появления года
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    chunks = {}
+    try:
+        partition(csv.reader(read_range(file_name, start, end)), header, chunks,
+                  lambda year: open_chunk(year, header, out_dir, buffer_size, fmt, part=True, compression=compression))
+    finally:
+        for chunk in chunks.values():
+            chunk.close()
+    return {year: chunk.path for year, chunk in chunks.items()}
+
+def merge_parts(year, part_paths, header, out_dir="csv", buffer_size=BUFFER_SIZE, fmt="csv", append=False,
+                compression=""):
+    """Собирает годовой чанк из частей в порядке диапазонов, поэтому порядок вакансий совпадает с входным файлом
+
+        Args:
+            year (str): Год вакансий чанка
+            part_paths (list): Пути до частей чанка в порядке диапазонов
+            header (list): Поля csv файла
+            out_dir (str): Папка для чанков
+            buffer_size (int): Размер буфера записи в байтах
+            fmt (str): "csv" - csv файл, "columnar" - бинарный колоночный формат
+            append (bool): Дописывать в существующий чанк
+            compression (str): Расширение сжатия csv чанка
+
+        Returns:
+            (str, int): Путь до чанка и размер чанка до записи
+    """
+    chunk = open_chunk(year, header, out_dir, buffer_size, fmt, append, compression=compression)
+    try:
+        for part_path in part_paths:
+            chunk.extend(part_path)
+    finally:
+        chunk.close()
+    return chunk.path, chunk.offset
+
+def parallel_chuncker(file_name, out_dir="csv", buffer_size=BUFFER_SIZE, fmt="csv", append=False, workers=None,
+                      compression=""):
+    """Разбивает csv файл на чанки по годам в пуле процессов: файл делится на диапазоны байтов по границам строк,
+    каждый процесс раскладывает свой диапазон по годам во временные части, затем части каждого года
+    склеиваются в чанк. Результат совпадает с сsv_chuncker
+
+        Args:
+            file_name (str): Название файла
+            out_dir (str): Папка для чанков
+            buffer_size (int): Размер буфера записи одного года в байтах
+            fmt (str): "csv" - csv файлы, "columnar" - бинарный колоночный формат
+            append (bool): Дописывать вакансии в существующие чанки вместо их перезаписи
+            workers (int): Число процессов, по умолчанию число ядер
+            compression (str): Расширение сжатия csv чанков
+
+        Returns:
+            dict: Путь до каждого записанного чанка -> размер чанка до записи
+    """
+    workers = workers or os.cpu_count()
+    os.makedirs(out_dir, exist_ok=True)
+    header, start = read_header(file_name)
+    ranges = split_ranges(file_name, start, workers)
+    parts_dir = tempfile.mkdtemp(prefix=".parts_", dir=out_dir)
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(chunk_range, *zip(*[(file_name, first, last, header,
+                                                           os.path.join(parts_dir, str(number)), buffer_size, fmt,
+                                                           compression)
+                                                          for number, (first, last) in enumerate(ranges)])))
+            years = {}
+            for part in parts:
+                for year, part_path in part.items():
+                    years.setdefault(year, []).append(part_path)
+            merged = [executor.submit(merge_parts, year, part_paths, header, out_dir, buffer_size, fmt, append,
+                                      compression)
+                      for year, part_paths in years.items()]
+            return dict(answer.result() for answer in merged)
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+def сsv_chuncker(file_name, out_dir="csv", buffer_size=BUFFER_SIZE, fmt="csv", append=False, workers=1,
+                 compression="", dedup_rate=None):
+    """Разбивает csv файл на чанки по годам публикации вакансий.
+    Файл читается потоково, для каждого года держится один открытый буферизованный чанк,
+    поэтому потребление памяти не зависит от размера входного файла. Сжатые файлы (.gz, .xz, .bz2)
+    распаковываются на лету. Несжатые файлы от 2 * MIN_RANGE_SIZE байт при workers > 1
+    разбиваются параллельно через parallel_chuncker.
+    При dedup_rate повторные вакансии пропускаются по фильтру отпечатков из папки чанков, который сохраняется
+    после разбивки, поэтому следующие выгрузки с append проверяются по всей истории. Если фильтр уже есть
+    в папке, дозапись без dedup_rate тоже добавляет в него отпечатки, но дубликаты не пропускает, чтобы
+    следующая дедупликация учитывала и эти вакансии. Фильтр общий для всех вакансий, поэтому с ним
+    файл разбивается в одном процессе
+
+        Args:
+            file_name (str): Название файла
+            out_dir (str): Папка для чанков
+            buffer_size (int): Размер буфера записи одного года в байтах
+            fmt (str): "csv" - csv файлы, "columnar" - бинарный колоночный формат
+            append (bool): Дописывать вакансии в существующие чанки вместо их перезаписи
+            workers (int): Число процессов для разбивки, None - число ядер
+            compression (str): Расширение сжатия csv чанков (".gz", ".xz", ".bz2"), "" - без сжатия
+            dedup_rate (float): Вероятность принять новую вакансию за дубликат, None - без дедупликации
+
+        Returns:
+            dict: Путь до каждого записанного чанка -> размер чанка до записи
+                (в байтах для csv, в вакансиях для колоночного формата)
+    """
+    dedup_path = os.path.join(out_dir, dedup.DEDUP_FILE)
+    seen = None
+    if append and os.path.exists(dedup_path):
+        seen = dedup.Deduplicator.load(dedup_path)
+    elif dedup_rate is not None:
+        seen = dedup.Deduplicator(dedup_rate)
+    elif os.path.exists(dedup_path):
+        os.remove(dedup_path)
+    workers = min(workers or os.cpu_count(), os.path.getsize(file_name) // MIN_RANGE_SIZE)
+    if workers > 1 and compressor(file_name) is None and seen is None:
+        return parallel_chuncker(file_name, out_dir, buffer_size, fmt, append, workers, compression)
+    os.makedirs(out_dir, exist_ok=True)
+    chunks = {}
+    try:
+        with open_text(file_name) as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            partition(reader, header, chunks,
+                      lambda year: open_chunk(year, header, out_dir, buffer_size, fmt, append, compression=compression),
+                      seen, dedup_rate is not None)
+    finally:
+        for chunk in chunks.values():
+            chunk.close()
+    if seen is not None:
+        seen.save(dedup_path)
+    return {chunk.path: chunk.offset for chunk in chunks.values()}
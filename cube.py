@@ -0,0 +1,149 @@
+from aggregate import merge_stat, merge_stats
+from sketch import MAX_SALARY, KLLSketch
+
+DIMENSIONS = ("year", "month", "city", "experience")
+
+class Cube:
+    """Предагрегированный куб зарплат: для каждой ячейки (месяц, город, опыт) хранятся
+    сумма, количество и скетч квантилей. Ячейки сгруппированы по городам, поэтому свертка по одному городу
+    просматривает только его ячейки
+
+        Attributes:
+            cells (dict): Город -> {(месяц вида YYYY-MM, опыт): [сумма, количество, скетч]}
+            rows (int): Число вакансий, по которым построен куб
+    >>> cube = Cube()
+    >>> for month, city, experience, salary in [("2020-01", "Москва", "noExperience", 100.0),
+    ...                                         ("2020-02", "Москва", "between1And3", 300.0),
+    ...                                         ("2021-01", "Казань", "noExperience", 50.0)]:
+    ...     cube.add(month, city, experience, salary)
+    >>> [(key, stat[:2]) for key, stat in cube.rollup(("year",)).items()]
+    [(('2020',), [400.0, 2]), (('2021',), [50.0, 1])]
+    >>> [(key, stat[:2]) for key, stat in cube.rollup(("experience",), city="Москва", start="2020-02").items()]
+    [(('between1And3',), [300.0, 1])]
+    """
+    __slots__ = ("cells", "rows")
+
+    def __init__(self):
+        """Инициализирует пустой куб
+        """
+        self.cells = {}
+        self.rows = 0
+
+    def add(self, month, city, experience, salary):
+        """Добавляет зарплату в ячейку куба
+
+            Args:
+                month (str): Месяц публикации вида YYYY-MM
+                city (str): Город
+                experience (str): Опыт работы из experience_id
+                salary (float): Зарплата
+        """
+        cells = self.cells.get(city)
+        if cells is None:
+            cells = self.cells[city] = {}
+        cell = cells.get((month, experience))
+        if cell is None:
+            cells[(month, experience)] = [salary, 1, KLLSketch.from_values([salary])]
+        else:
+            cell[0] += salary
+            cell[1] += 1
+            cell[2].update(salary)
+
+    def add_vacancy(self, salary, city, published_at, experience, max_salary=MAX_SALARY):
+        """Учитывает вакансию в кубе: пустые зарплаты и выбросы только увеличивают число вакансий rows
+
+            Args:
+                salary (str): Зарплата в рублях или пустая строка
+                city (str): Город
+                published_at (str): Дата публикации вакансии
+                experience (str): Опыт работы из experience_id
+                max_salary (float): Порог выбросов
+        """
+        self.rows += 1
+        if salary == "":
+            return
+        value = float(salary)
+        if value <= max_salary:
+            self.add(published_at[:7], city, experience, value)
+
+    def merge(self, other, copy=True):
+        """Добавляет в куб ячейки другого куба
+
+            Args:
+                other (Cube): Другой куб
+                copy (bool): Не изменять скетчи другого куба, False - другой куб больше не используется
+                    и его ячейки переносятся без копирования
+
+            Returns:
+                Cube: Этот куб
+        """
+        for city, other_cells in other.cells.items():
+            merge_stats(self.cells.setdefault(city, {}), other_cells, copy)
+        self.rows += other.rows
+        return self
+
+    def rollup(self, by=("month",), city=None, experience=None, start=None, end=None):
+        """Сворачивает куб до выбранных измерений с фильтрами по городу, опыту и периоду
+
+            Args:
+                by (tuple): Измерения результата из DIMENSIONS
+                city (str): Город или None - все города
+                experience (str): Опыт работы или None - любой опыт
+                start (str): Первый месяц периода вида YYYY или YYYY-MM включительно, None - без ограничения
+                end (str): Последний месяц периода вида YYYY или YYYY-MM включительно, None - без ограничения
+
+            Returns:
+                dict: Кортеж значений измерений -> [сумма, количество, скетч], ключи по возрастанию
+        """
+        unknown = set(by) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError("Неизвестные измерения куба: " + ", ".join(sorted(unknown)))
+        cities = self.cells.items() if city is None else [(city, self.cells.get(city, {}))]
+        result = {}
+        for area_name, cells in cities:
+            for (month, cell_experience), cell in cells.items():
+                if experience is not None and cell_experience != experience:
+                    continue
+                if start is not None and month[:len(start)] < start or end is not None and month[:len(end)] > end:
+                    continue
+                values = {"year": month[:4], "month": month, "city": area_name, "experience": cell_experience}
+                merge_stat(result, tuple(values[dimension] for dimension in by), cell)
+        return {key: result[key] for key in sorted(result)}
+
+    def rollup_stats(self, by=("month",), city=None, experience=None, start=None, end=None, qs=(0.1, 0.5, 0.9)):
+        """Сворачивает куб и переводит результат в записи для вывода в JSON
+
+            Args:
+                by (tuple): Измерения результата из DIMENSIONS
+                city (str): Город или None - все города
+                experience (str): Опыт работы или None - любой опыт
+                start (str): Первый месяц периода включительно
+                end (str): Последний месяц периода включительно
+                qs (tuple): Уровни квантилей
+
+            Returns:
+                list: Записи со значениями измерений, средней зарплатой, числом вакансий и квантилями
+        """
+        records = []
+        for key, (stat_sum, stat_count, stat_sketch) in self.rollup(by, city, experience, start, end).items():
+            record = dict(zip(by, key))
+            record["salary"] = int(stat_sum / stat_count)
+            record["vacancies"] = stat_count
+            record.update({"p%d" % round(q * 100): value for q, value in stat_sketch.quantiles(qs).items()})
+            records.append(record)
+        return records
+
+def get_cube(rows, max_salary=MAX_SALARY):
+    """Строит куб по строкам вакансий
+
+        Args:
+            rows (iterable): Строки вакансий из CSVReader.iter_rows с дополнительным полем experience_id
+            max_salary (float): Порог выбросов, зарплаты выше него не учитываются
+
+        Returns:
+            Cube: Куб
+    """
+    cube = Cube()
+    for name, salary, area_name, published_at, experience in rows:
+        cube.add_vacancy(salary, area_name, published_at, experience, max_salary)
+    return cube
@@ -0,0 +1,162 @@
+import csv
+import hashlib
+
+RUBLES = ("RUR", "")
+
+def month_number(published_at):
+    """Возвращает сквозной номер месяца (год * 12 + месяц - 1) по дате вида YYYY-MM...
+
+        Args:
+            published_at (str): Дата публикации вакансии или месяц курса
+
+        Returns:
+            int: Номер месяца
+    >>> month_number("2007-12-03T17:40:09+0300")
+    24095
+    >>> month_number("2008-01")
+    24096
+    """
+    return int(published_at[:4]) * 12 + int(published_at[5:7]) - 1
+
+class CurrencyTable:
+    """Таблица месячных курсов валют к рублю. Курсы хранятся списками по номеру месяца,
+    поэтому пересчет зарплаты - это обращение по целому индексу месяца без поиска по таблице.
+    Месяц публикации везде берется из локальной даты вакансии (первые 7 символов published_at),
+    колоночные чанки хранят его готовым номером для каждой строки
+
+        Attributes:
+            first_month (int): Номер первого месяца таблицы из month_number
+            months (int): Число месяцев в таблице
+            currencies (list): Коды валют таблицы
+            rates (dict): Код валюты -> курсы по месяцам, NaN - курс неизвестен
+            digest (str): Хэш курсов для ключей кэша агрегатов
+    >>> table = CurrencyTable(month_number("2007-12"), {"USD": [25.0, 24.5]})
+    >>> table.convert(100.0, "USD", "2008-01-15T10:00:00+0300"), table.convert(100.0, "RUR", "2022-01-01")
+    (2450.0, 100.0)
+    >>> table.convert(100.0, "USD", "2008-02-01T10:00:00+0300") is None, table.convert(100.0, "USD", "") is None
+    (True, True)
+    """
+    def __init__(self, first_month, rates):
+        """Инициализирует объект CurrencyTable
+
+            Args:
+                first_month (int): Номер первого месяца таблицы из month_number
+                rates (dict): Код валюты -> курсы по месяцам, начиная с first_month
+        """
+        self.first_month = first_month
+        self.months = max((len(values) for values in rates.values()), default=0)
+        self.currencies = list(rates)
+        self.rates = {currency: list(values) + [float("nan")] * (self.months - len(values))
+                      for currency, values in rates.items()}
+        self.digest = hashlib.blake2b(repr((first_month, sorted(self.rates.items()))).encode("utf-8"),
+                                      digest_size=16).hexdigest()
+        self._matrix = None
+
+    @classmethod
+    def load(cls, file_name):
+        """Загружает таблицу из csv файла с полем date (YYYY-MM) и полем курса к рублю для каждой валюты.
+        Пустые ячейки и пропущенные месяцы означают неизвестный курс
+
+            Args:
+                file_name (str): Название файла
+
+            Returns:
+                CurrencyTable: Таблица курсов
+        """
+        with open(file_name, encoding="UTF-8-sig", newline='') as File:
+            reader = csv.reader(File, delimiter=',')
+            fields = next(reader, [])
+            if "date" not in fields:
+                raise ValueError("В таблице курсов нет поля date: " + file_name)
+            date_index = fields.index("date")
+            rows = {month_number(row[date_index]): row for row in reader if row}
+        first_month = min(rows, default=0)
+        months = max(rows, default=-1) - first_month + 1
+        rates = {}
+        for index, currency in enumerate(fields):
+            if index == date_index:
+                continue
+            values = [float("nan")] * months
+            for month, row in rows.items():
+                if row[index] != "":
+                    values[month - first_month] = float(row[index])
+            rates[currency] = values
+        return cls(first_month, rates)
+
+    def convert(self, salary, currency, published_at):
+        """Переводит зарплату в рубли по курсу месяца публикации
+
+            Args:
+                salary (float): Зарплата в валюте
+                currency (str): Код валюты
+                published_at (str): Дата публикации вакансии
+
+            Returns:
+                float: Зарплата в рублях или None, если курс неизвестен
+        """
+        if currency in RUBLES:
+            return salary
+        rate = self.rate(currency, published_at[:7])
+        return salary * rate if rate is not None else None
+
+    def rate(self, currency, month):
+        """Возвращает курс валюты к рублю в месяце публикации. Потоковое чтение вызывает его
+        один раз на каждую различную пару (валюта, месяц), а не на каждую вакансию
+
+            Args:
+                currency (str): Код валюты
+                month (str): Месяц публикации вида YYYY-MM
+
+            Returns:
+                float: Курс или None, если он неизвестен
+        >>> CurrencyTable(month_number("2007-12"), {"USD": [25.0, 24.5]}).rate("USD", "2008-01")
+        24.5
+        """
+        if currency in RUBLES:
+            return 1.0
+        rates = self.rates.get(currency)
+        if rates is None or len(month) < 7:
+            return None
+        index = month_number(month) - self.first_month
+        if not 0 <= index < self.months:
+            return None
+        rate = rates[index]
+        return rate if rate == rate else None
+
+    def matrix(self):
+        """Возвращает курсы массивом NumPy (валюта, месяц) с дополнительной строкой NaN для неизвестных валют.
+        Массив строится один раз
+
+            Returns:
+                np.ndarray: Курсы
+        """
+        if self._matrix is None:
+            import numpy as np
+            matrix = np.full((len(self.currencies) + 1, max(self.months, 1)), np.nan)
+            for code, currency in enumerate(self.currencies):
+                matrix[code, :self.months] = self.rates[currency]
+            self._matrix = matrix
+        return self._matrix
+
+    def convert_array(self, salary, currencies, currency_codes, months):
+        """Векторно переводит колонку зарплат в рубли
+
+            Args:
+                salary (np.ndarray): Зарплаты в валюте
+                currencies (np.ndarray): Словарь кодов валют чанка
+                currency_codes (np.ndarray): Номер валюты в словаре для каждой строки
+                months (np.ndarray): Номер месяца публикации из month_number для каждой строки
+
+            Returns:
+                np.ndarray: Зарплаты в рублях, NaN - курс неизвестен
+        """
+        import numpy as np
+        codes = {currency: code for code, currency in enumerate(self.currencies)}
+        table_codes = np.array([codes.get(str(currency), len(self.currencies)) for currency in currencies],
+                               dtype=np.int64)
+        index = np.asarray(months, dtype=np.int64) - self.first_month
+        inside = (index >= 0) & (index < self.months)
+        rate = self.matrix()[table_codes[currency_codes], np.clip(index, 0, max(self.months - 1, 0))]
+        rate[~inside] = np.nan
+        rate[np.isin(np.asarray(currencies, dtype=str), RUBLES)[currency_codes]] = 1.0
+        return salary * rate
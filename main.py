@@ -1,16 +1,24 @@
-from multiprocessing import Pool, cpu_count
 import csv
 import os
 import re
-import matplotlib.pyplot as plt
-import numpy as np
-from os import path
-from prettytable import PrettyTable
-import pdfkit
-import doctest
 import concurrent.futures
+import argparse
+import io
+import base64
+import threading
+from html import escape
 from functools import partial
+import json
+import math
+import sys
 import chuncker
+import cube
+from aggregate import Aggregate, BatchAggregate, count_groups, merge_stats, pack_groups, tree_reduce, unpack_groups
+from cache import AggregateCache
+from currency import RUBLES, CurrencyTable
+import profiling
+from pdf import PdfRenderer
+from sketch import CUTOFF_TOLERANCE, MAX_SALARY, KLLSketch, merge_sketches, robust_cutoff
 experienceToRus = {
     "noExperience": "Нет опыта",
     "between1And3": "От 1 года до 3 лет",
@@ -69,6 +77,22 @@ def files(path):
         if os.path.isfile(os.path.join(path, file)):
             yield path + "/" + file
 
+def chunks(path, fmt="csv", compression=""):
+    """Возвращает годовые чанки заданного формата из папки
+
+        Args:
+            path (str): Папка с чанками
+            fmt (str): "csv" - csv файлы, "columnar" - папки в колоночном формате
+            compression (str): Расширение сжатия csv чанков (".gz", ".xz", ".bz2"), "" - без сжатия
+
+        Yields:
+            str: Путь до чанка
+    """
+    suffix = chuncker.COLUMNAR_SUFFIX if fmt == "columnar" else ".csv" + compression
+    for file in os.listdir(path):
+        if file.startswith("vacancies_") and file.endswith(suffix):
+            yield path + "/" + file
+
 def get_key(d, value):
     """Получает первый ключ по значению
 
@@ -141,7 +165,8 @@ class Vacancy:
         return int(self.date_to_string().split(".")[-1])
 
 class HtmlGenerator:
-    """Класс для генерации HTML страницы
+    """Класс для генерации HTML страницы. Части страницы пишутся по очереди в один поток вывода
+    (io.StringIO или открытый файл), поэтому время генерации линейно зависит от размера страницы
     """
     def generate_table(self, titles, content):
         """Возвращает HTML код таблицы
@@ -153,12 +178,13 @@ class HtmlGenerator:
             Returns:
                 str: HTML код таблицы
         """
-        table = "<table>"
-        table += self.generate_titles(titles)
+        out = io.StringIO()
+        out.write("<table>")
+        self.write_titles(out, titles)
         for row in content:
-            table += self.generate_row(row)
-        table += "</table>"
-        return table
+            self.write_row(out, row)
+        out.write("</table>")
+        return out.getvalue()
 
     def generate_titles(self, titles):
         """Возвращает HTML код для заголовков таблицы
@@ -169,11 +195,9 @@ class HtmlGenerator:
             Returns:
                 str: HTML код заголовков
         """
-        string = "<tr>"
-        for title in titles:
-            string += "<th>" + title + "</th>"
-        string += "</tr>"
-        return string
+        out = io.StringIO()
+        self.write_titles(out, titles)
+        return out.getvalue()
 
     def generate_row(self, row):
         """Возвращает HTML код для строки таблицы
@@ -184,24 +208,56 @@ class HtmlGenerator:
             Returns:
                 str: HTML код для строки
         """
-        string = "<tr>"
+        out = io.StringIO()
+        self.write_row(out, row)
+        return out.getvalue()
+
+    def write_titles(self, out, titles):
+        """Пишет HTML код заголовков таблицы в поток, экранируя текст
+
+            Args:
+                out (io.TextIOBase): Поток вывода
+                titles (list): Заголовки столбцов
+        """
+        out.write("<tr>")
+        for title in titles:
+            out.write("<th>")
+            out.write(escape(str(title), quote=False))
+            out.write("</th>")
+        out.write("</tr>")
+
+    def write_row(self, out, row):
+        """Пишет HTML код строки таблицы в поток, экранируя текст
+
+            Args:
+                out (io.TextIOBase): Поток вывода
+                row (list): Строка таблицы
+        """
+        out.write("<tr>")
         for row_item in row:
-            string += "<td>" + str(row_item) + "</td>"
-        string += "</tr>"
-        return string
+            out.write("<td>")
+            out.write(escape(str(row_item), quote=False))
+            out.write("</td>")
+        out.write("</tr>")
 
-    def generate_html(self, dicts, image_path, prof_name, city_name):
+    def generate_html(self, dicts, image_path, prof_name, city_name, out=None):
         """Возвращает HTML код страницы с графиками и 3-мя таблицами 
 
             Args:
                 dicts (list): Словари со строками и заголовками для таблиц
                 image_path (str): Путь до графика
                 prof_name (str): Имя выбранной профессии
+                city_name (str): Имя выбранного города
+                out (io.TextIOBase): Поток для записи страницы, например открытый файл.
+                    Если не передан, страница собирается в памяти и возвращается
             
             Returns:
-                str: HTML код страницы
+                str: HTML код страницы или None, если страница записана в out
         """
-        html = """<!DOCTYPE html>
+        result = out
+        if out is None:
+            out = io.StringIO()
+        out.write("""<!DOCTYPE html>
                     <html lang="en">
                     <head>
                         <meta charset="UTF-8">
@@ -221,110 +277,210 @@ class HtmlGenerator:
                     }
                     </style>
                     <body>
-                    <h1 style="text-align: center; font-size: 60px;">Аналитика по зарплатам и городам для профессии """ + prof_name + """</h1>
-                    <img src=\"""" + image_path + """\">"""
+                    <h1 style="text-align: center; font-size: 60px;">Аналитика по зарплатам и городам для профессии """)
+        out.write(escape(prof_name, quote=False))
+        out.write("""</h1>
+                    <img src=\"""")
+        out.write(escape(image_path))
+        out.write("\">")
         # 1
         titles = ["Год", "Средняя зарплата - " + prof_name, "Количество вакансий - " + prof_name]
-        html += f"<h1 style='text-align:center;'>Статистика по годам для города {city_name}</h1>"
-        html += "<table style='width: 100%;'>" + self.generate_titles(titles)
+        out.write("<h1 style='text-align:center;'>Статистика по годам для города ")
+        out.write(escape(city_name, quote=False))
+        out.write("</h1>")
+        out.write("<table style='width: 100%;'>")
+        self.write_titles(out, titles)
         dict = dicts[0]
-        for i in range(len(dict[0])):
-            year = dict[0][i]
-            avgSalaryProf = list(dict[3].values())[i]
-            vacAmountProf = list(dict[4].values())[i]
-            row = [year, avgSalaryProf, vacAmountProf]
-            html += self.generate_row(row)
-        html += """</table> <br>"""
+        for year, avgSalaryProf, vacAmountProf in zip(dict[0], dict[3].values(), dict[4].values()):
+            self.write_row(out, [year, avgSalaryProf, vacAmountProf])
+        out.write("""</table> <br>""")
 
         # 2
         titles = ["Город", "Уровень зарплат"]
-        html += "<h1 style='text-align:center;'>Статистика по городам</h1>"
-        html += "<table style='float: left; width: 45%;'>" + self.generate_titles(titles)
-        dict = dicts[1][0]
-        values = list(dict.values())
-        keys = list(dict.keys())
-        for i in range(len(values)):
-            city = keys[i]
-            avgSalary = values[i]
-            row = [city, avgSalary]
-            html += self.generate_row(row)
-        html += "</table>"
+        out.write("<h1 style='text-align:center;'>Статистика по городам</h1>")
+        out.write("<table style='float: left; width: 45%;'>")
+        self.write_titles(out, titles)
+        for city, avgSalary in dicts[1][0].items():
+            self.write_row(out, [city, avgSalary])
+        out.write("</table>")
 
         # 3
         titles = ["Город", "Доля вакансий"]
-        html += "<table style='float: right; width: 45%;'>" + self.generate_titles(titles)
-        dict = dicts[1][1]
-        values = list(dict.values())
-        keys = list(dict.keys())
-        for i in range(len(values)):
-            city = keys[i]
-            percent = str(values[i] * 100).replace(".", ",") + "%"
-            row = [city, percent]
-            html += self.generate_row(row)
-        html += "</table></body></html>"
-        return html
+        out.write("<table style='float: right; width: 45%;'>")
+        self.write_titles(out, titles)
+        for city, percent in dicts[1][1].items():
+            self.write_row(out, [city, str(percent * 100).replace(".", ",") + "%"])
+        out.write("</table></body></html>")
+        if result is None:
+            return out.getvalue()
             
+_graph_style_lock = threading.Lock()
+_graph_style_ready = False
+_graph_figures = threading.local()
+
+def setup_graph_style():
+    """Один раз применяет стиль графиков. Стиль глобальный, поэтому меняется только
+    до первого рисования, а не при каждом отчете
+    """
+    global _graph_style_ready
+    import matplotlib.style
+    with _graph_style_lock:
+        if not _graph_style_ready:
+            matplotlib.style.use('ggplot')
+            matplotlib.rcParams.update({'font.size': 8})
+            _graph_style_ready = True
+
+def get_graph_figure():
+    """Возвращает очищенную фигуру текущего потока. Фигура с холстом Agg создается один раз
+    на поток и переиспользуется, глобальное состояние pyplot не используется
+
+        Returns:
+            Figure: Фигура для рисования графиков
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    figure = getattr(_graph_figures, "figure", None)
+    if figure is None:
+        figure = Figure()
+        FigureCanvasAgg(figure)
+        _graph_figures.figure = figure
+    figure.clear()
+    return figure
+
+def render_graph(dicts, prof_name, city_name, fmt="png"):
+    """Рисует графики отчета и возвращает изображение в памяти.
+    Функция не зависит от глобального состояния, поэтому ее можно вызывать параллельно в потоках и процессах
+
+        Args:
+            dicts (list): Данные для графиков
+            prof_name (str): Имя выбранной профессии
+            city_name (str): Имя выбранного города
+            fmt (str): Формат изображения: "png" или "svg"
+
+        Returns:
+            bytes: Изображение
+    """
+    import numpy as np
+    setup_graph_style()
+    figure = get_graph_figure()
+    dictsSalary = dicts[0]
+    dictsCities = dicts[1]
+    years = dictsSalary[0]
+
+    x = np.arange(len(years))
+    width = 0.35
+    ax = figure.add_subplot(2, 2, 1)
+    ax.bar(x - width / 2, list(dictsSalary[1].values()), width, label='средняя з/п')
+    ax.bar(x + width / 2, list(dictsSalary[3].values()), width, label='з/п ' + prof_name)
+    ax.legend()
+    ax.set_xticks(x, years, rotation=90)
+    ax.set_title("Уровень зарплат по годам для \n"+city_name)
+
+    ax = figure.add_subplot(2, 2, 2)
+    ax.bar(x - width / 2, list(dictsSalary[2].values()), width, label='Количество вакансий')
+    ax.bar(x + width / 2, list(dictsSalary[4].values()), width, label='Количество вакансий\n' + prof_name)
+    ax.legend()
+    ax.set_xticks(x, years, rotation=90)
+    ax.set_title("Количество вакансий по годам для \n"+city_name)
+
+    ax = figure.add_subplot(2, 2, 3)
+    ax.barh(list(reversed(list(dictsCities[0].keys()))), list(reversed(dictsCities[0].values())), alpha=0.8, )
+    ax.set_title("Уровень зарплат по городам")
+
+    ax = figure.add_subplot(2, 2, 4)
+    ax.pie(list(dictsCities[1].values()) + [1 - sum(list(dictsCities[1].values()))],
+           labels=list(dictsCities[1].keys()) + ["Другие"])
+    ax.set_title("Доля вакансий по городам")
+    figure.subplots_adjust(wspace=0.5, hspace=0.5)
+
+    image = io.BytesIO()
+    figure.savefig(image, format=fmt, dpi=200, bbox_inches='tight')
+    figure.clear()
+    return image.getvalue()
+
+def image_data_uri(image, fmt="png"):
+    """Возвращает изображение в виде data URI для встраивания в HTML
+
+        Args:
+            image (bytes): Изображение
+            fmt (str): Формат изображения: "png" или "svg"
+
+        Returns:
+            str: data URI
+    >>> image_data_uri(b"abc")
+    'data:image/png;base64,YWJj'
+    """
+    mime = "image/svg+xml" if fmt == "svg" else "image/png"
+    return "data:" + mime + ";base64," + base64.b64encode(image).decode("ascii")
+
+def render_graphs(jobs, mode="thread", fmt="png"):
+    """Параллельно рисует графики нескольких отчетов
+
+        Args:
+            jobs (list): Тройки (dicts, prof_name, city_name)
+            mode (str): "thread" - пул потоков, "process" - пул процессов по числу ядер
+            fmt (str): Формат изображений: "png" или "svg"
+
+        Returns:
+            list: Изображения в порядке jobs
+    """
+    with get_executor(mode) as executor:
+        return list(executor.map(render_graph, *zip(*jobs), [fmt] * len(jobs))) if jobs else []
+
 class Report:
     """Класс для создания графиков
 
         Attributes:
             filename (str): Имя файла
-            html (str): HTML код страницы
+            dicts (list): Данные для графиков и таблиц
+            prof_name (str): Имя выбранной профессии
+            city_name (str): Имя выбранного города
+            fmt (str): Формат изображения: "png" или "svg"
+            image (bytes): Изображение с графиками
+            html (str): HTML код страницы со встроенным изображением
     """
-    def __init__(self, name, dicts, prof_name, city_name):
+    def __init__(self, name, dicts, prof_name, city_name, image=None, fmt="png"):
         """Инициализирует объект Report, генерирует граф и создает HTML код страницы
             Args:
                 name (str): Имя файла
                 dicts (list): Данные для графиков и таблиц
                 prof_name (str): Имя выбранной профессии
+                city_name (str): Имя выбранного города
+                image (bytes): Заранее нарисованные графики, например из render_graphs
+                fmt (str): Формат изображения: "png" или "svg"
         """
         generator = HtmlGenerator()
-        parent_dir = path.dirname(path.abspath(__file__))
         self.filename = name
-        self.generate_graph(dicts, prof_name, city_name)
-        self.html = generator.generate_html(dicts, parent_dir + '/temp.png', prof_name, city_name)
+        self.dicts = dicts
+        self.prof_name = prof_name
+        self.city_name = city_name
+        self.fmt = fmt
+        self.image = image if image is not None else self.generate_graph(dicts, prof_name, city_name, fmt)
+        self.html = generator.generate_html(dicts, image_data_uri(self.image, fmt), prof_name, city_name)
 
-    def generate_graph(self, dicts, prof_name, city_name):
-        """Создает и сохраняет в виде файла графики
+    def generate_graph(self, dicts, prof_name, city_name, fmt="png"):
+        """Создает графики и возвращает их изображение
 
             Args:
                 dicts (list): Данные для графиков
                 prof_name (str): Имя выбранной профессии
+                city_name (str): Имя выбранного города
+                fmt (str): Формат изображения: "png" или "svg"
+
+            Returns:
+                bytes: Изображение
         """
-        dictsSalary = dicts[0]
-        dictsCities = dicts[1]
-        years = dictsSalary[0]
-        plt.grid(axis='y')
-        plt.style.use('ggplot')
-        plt.rcParams.update({'font.size': 8})
-
-        x = np.arange(len(years))
-        width = 0.35
-        ax = plt.subplot(2, 2, 1)
-        ax.bar(x - width / 2, dictsSalary[1].values(), width, label='средняя з/п')
-        ax.bar(x + width / 2, dictsSalary[3].values(), width, label='з/п ' + prof_name)
-        ax.legend()
-        ax.set_xticks(x, years, rotation=90)
-        plt.title("Уровень зарплат по годам для \n"+city_name)
-
-        ax = plt.subplot(2, 2, 2)
-        ax.bar(x - width / 2, dictsSalary[2].values(), width, label='Количество вакансий')
-        ax.bar(x + width / 2, dictsSalary[4].values(), width, label='Количество вакансий\n' + prof_name)
-        ax.legend()
-        ax.set_xticks(x, years, rotation=90)
-        plt.title("Количество вакансий по годам для \n"+city_name)
-
-        plt.subplot(2, 2, 3)
-        plt.barh(list(reversed(list(dictsCities[0].keys()))), list(reversed(dictsCities[0].values())), alpha=0.8, )
-        plt.title("Уровень зарплат по городам")
-
-        plt.subplot(2, 2, 4)
-        plt.pie(list(dictsCities[1].values()) + [1 - sum(list(dictsCities[1].values()))],
-                labels=list(dictsCities[1].keys()) + ["Другие"])
-        plt.title("Доля вакансий по городам")
-        plt.subplots_adjust(wspace=0.5, hspace=0.5)
-
-        plt.savefig("temp.png", dpi=200, bbox_inches='tight')
+        return render_graph(dicts, prof_name, city_name, fmt)
+
+    def png_image(self):
+        """Возвращает графики отчета в формате PNG
+
+            Returns:
+                bytes: Изображение PNG
+        """
+        if self.fmt == "png":
+            return self.image
+        return render_graph(self.dicts, self.prof_name, self.city_name, "png")
 
 class DataSet:
     """Класс для хранения названия файла и всех вакансий
@@ -373,7 +529,7 @@ class CSVReader:
         """
         vacancies = []
         fields = []
-        with open(ﬁle_name, encoding="UTF-8-sig") as File:
+        with chuncker.open_text(ﬁle_name) as File:
             reader = csv.reader(File, delimiter=',')
             for row in reader:
                 if (fields == []):
@@ -385,6 +541,70 @@ class CSVReader:
             File.close()
         return [year, vacancies]
 
+    def iter_rows(self, file_name, offset=0, currency=None, extra_fields=()):
+        """Потоково считывает вакансии с файла, не создавая объекты Vacancy
+
+            Args:
+                file_name (str): Название файла, сжатые файлы (.gz, .xz, .bz2) распаковываются на лету
+                offset (int): Смещение в байтах, с которого читать вакансии (0 - сразу после заголовка)
+                currency (CurrencyTable): Таблица курсов. Если она передана и в файле есть поле salary_currency,
+                    зарплата переводится в рубли и отдается числом, зарплата с неизвестным курсом - пустой строкой
+                extra_fields (tuple): Дополнительные поля, которые добавляются в конец строки,
+                    отсутствующие в файле поля отдаются пустой строкой
+
+            Yields:
+                tuple: Название, зарплата, город и дата публикации вакансии, затем extra_fields
+        """
+        fields = chuncker.read_fields(file_name)
+        with chuncker.open_lines(file_name, offset) as lines:
+            reader = csv.reader(lines, delimiter=',')
+            if not offset:
+                next(reader, None)
+            name_index = fields.index("name") if "name" in fields else None
+            salary_index = fields.index("salary")
+            area_index = fields.index("area_name") if "area_name" in fields else None
+            date_index = fields.index("published_at") if "published_at" in fields else None
+            currency_index = None
+            if currency is not None and "salary_currency" in fields:
+                currency_index = fields.index("salary_currency")
+            extra_indexes = [fields.index(field) if field in fields else None for field in extra_fields]
+            rates = {}
+            for row in reader:
+                if not row:
+                    continue
+                salary = row[salary_index]
+                published_at = row[date_index] if date_index is not None else ""
+                if currency_index is not None and salary != "" and row[currency_index] not in RUBLES:
+                    key = (row[currency_index], published_at[:7])
+                    if key not in rates:
+                        rates[key] = currency.rate(*key)
+                    rate = rates[key]
+                    salary = float(salary) * rate if rate is not None else ""
+                vacancy = (row[name_index] if name_index is not None else "",
+                           salary,
+                           row[area_index] if area_index is not None else "",
+                           published_at)
+                if extra_indexes:
+                    vacancy += tuple(row[index] if index is not None else "" for index in extra_indexes)
+                yield vacancy
+
+def queries_by_city(queries, salaries):
+    """Раскладывает пары (профессия, город) по городам, чтобы для вакансии проверялись только профессии ее города
+
+        Args:
+            queries (list): Пары (профессия, город)
+            salaries (list): [сумма, количество, скетч] зарплат для каждой пары
+
+        Returns:
+            dict: Город -> пары (профессия, [сумма, количество, скетч]) в порядке queries
+    >>> queries_by_city([("Java", "Москва"), ("Python", "Казань"), ("C++", "Москва")], [1, 2, 3])
+    {'Москва': [('Java', 1), ('C++', 3)], 'Казань': [('Python', 2)]}
+    """
+    by_city = {}
+    for (prof_name, city_name), salary in zip(queries, salaries):
+        by_city.setdefault(city_name, []).append((prof_name, salary))
+    return by_city
+
 class DataWorker:
     """Класс для статистической обработки вакансий
     """
@@ -409,7 +629,7 @@ class DataWorker:
         for vacancy in vacancies_objects:
             if vacancy.salary == "":
                 continue
-            if float(vacancy.salary) > 20000000:
+            if float(vacancy.salary) > MAX_SALARY:
                 continue    
             avg_salary = float(vacancy.salary)
             if prof_name in vacancy.name and vacancy.area_name == city_name:
@@ -435,44 +655,261 @@ class DataWorker:
                 cities_amount[vacancy.area_name] += 1
         return [year, salary_out, amount_out, salary_prof_out, amount_prof_out, cities_salary, cities_amount]
 
-def print_data(data, total_vacancies):
+    def get_data_stream(self, prof_name, rows, city_name, max_salary=MAX_SALARY):
+        """Обрабатывает вакансии за один проход по потоку строк, накапливая суммы, количества
+        и скетчи квантилей. Результат совпадает с compact_data(get_data(...)), но списки зарплат не создаются
+
+            Args:
+                prof_name (str): Имя выбранной профессии
+                rows (iterable): Строки вакансий из CSVReader.iter_rows
+                city_name (str): Имя выбранного города
+                max_salary (float): Порог выбросов, зарплаты выше него не учитываются
+
+            Returns:
+                Aggregate: Статистические данные года и число вакансий
+        """
+        published_at = None
+        rows_count = 0
+        salary_sum = 0.0
+        salary_count = 0
+        salary_sketch = KLLSketch()
+        cities_salary = {}
+        for name, salary, area_name, published_at in rows:
+            rows_count += 1
+            if salary == "":
+                continue
+            avg_salary = float(salary)
+            if avg_salary > max_salary:
+                continue
+            if prof_name in name and area_name == city_name:
+                salary_sum += avg_salary
+                salary_count += 1
+                salary_sketch.update(avg_salary)
+
+            city_salary = cities_salary.get(area_name)
+            if city_salary is None:
+                cities_salary[area_name] = [avg_salary, 1, KLLSketch.from_values([avg_salary])]
+            else:
+                city_salary[0] += avg_salary
+                city_salary[1] += 1
+                city_salary[2].update(avg_salary)
+        year = int(published_at.split("-")[0]) if published_at else None
+        salary = [salary_sum, salary_count, salary_sketch]
+        return Aggregate.from_year(year, salary, salary, cities_salary, rows_count)
+
+    def get_batch_data_stream(self, queries, rows, max_salary=MAX_SALARY):
+        """Обрабатывает вакансии для нескольких пар (профессия, город) за один проход по потоку строк.
+        Агрегаты по городам общие для всех пар и считаются один раз, для вакансии проверяются только
+        профессии ее города. Результат каждой пары совпадает с get_data_stream
+
+            Args:
+                queries (list): Пары (профессия, город)
+                rows (iterable): Строки вакансий из CSVReader.iter_rows
+                max_salary (float): Порог выбросов, зарплаты выше него не учитываются
+
+            Returns:
+                BatchAggregate: Статистические данные года всех пар и число вакансий
+        """
+        published_at = None
+        rows_count = 0
+        salaries = [[0.0, 0, KLLSketch()] for query in queries]
+        by_city = queries_by_city(queries, salaries)
+        cities_salary = {}
+        for name, salary, area_name, published_at in rows:
+            rows_count += 1
+            if salary == "":
+                continue
+            avg_salary = float(salary)
+            if avg_salary > max_salary:
+                continue
+            for prof_name, prof_salary in by_city.get(area_name, ()):
+                if prof_name in name:
+                    prof_salary[0] += avg_salary
+                    prof_salary[1] += 1
+                    prof_salary[2].update(avg_salary)
+
+            city_salary = cities_salary.get(area_name)
+            if city_salary is None:
+                cities_salary[area_name] = [avg_salary, 1, KLLSketch.from_values([avg_salary])]
+            else:
+                city_salary[0] += avg_salary
+                city_salary[1] += 1
+                city_salary[2].update(avg_salary)
+        year = int(published_at.split("-")[0]) if published_at else None
+        return BatchAggregate.from_year(year, salaries, cities_salary, rows_count)
+
+    def get_summary(self, rows, max_salary=MAX_SALARY):
+        """Считает не зависящие от запроса агрегаты года: сумму и количество зарплат для каждой пары
+        (название вакансии, город), сумму, количество и скетч квантилей зарплат для каждого города.
+        Скетчей по парам нет: квантили профессии считаются проходом по строкам в get_prof_salaries.
+        Пары хранятся массивами из pack_groups, поэтому агрегаты сохраняются в кэш без перекодирования.
+        Массивы пар лежат в списке частей: дозапись в чанк добавляет в кэш новую часть, см. put_summary
+
+            Args:
+                rows (iterable): Строки вакансий из CSVReader.iter_rows
+                max_salary (float): Порог выбросов, зарплаты выше него не учитываются
+
+            Returns:
+                dict: Год, число вакансий, агрегаты по городам и части - пары (словарь названий,
+                    массивы пар по городам)
+        """
+        published_at = None
+        rows_count = 0
+        groups = {}
+        cities = {}
+        for name, salary, area_name, published_at in rows:
+            rows_count += 1
+            if salary == "":
+                continue
+            avg_salary = float(salary)
+            if avg_salary > max_salary:
+                continue
+            city_groups = groups.get(area_name)
+            if city_groups is None:
+                city_groups = groups[area_name] = {}
+            group = city_groups.get(name)
+            if group is None:
+                city_groups[name] = [avg_salary, 1]
+            else:
+                group[0] += avg_salary
+                group[1] += 1
+            city = cities.get(area_name)
+            if city is None:
+                cities[area_name] = [avg_salary, 1, KLLSketch.from_values([avg_salary])]
+            else:
+                city[0] += avg_salary
+                city[1] += 1
+                city[2].update(avg_salary)
+        year = int(published_at.split("-")[0]) if published_at else None
+        return {"year": year, "rows": rows_count, "cities": cities, "parts": [pack_groups(groups)]}
+
+    def get_prof_salaries(self, queries, rows, max_salary=MAX_SALARY):
+        """Считает за один проход по потоку строк сумму, количество и скетч зарплат нескольких пар
+        (профессия, город) без агрегатов по городам, которые уже есть в агрегатах из get_summary
+
+            Args:
+                queries (list): Пары (профессия, город)
+                rows (iterable): Строки вакансий из CSVReader.iter_rows
+                max_salary (float): Порог выбросов, зарплаты выше него не учитываются
+
+            Returns:
+                list: [сумма, количество, скетч] зарплат для каждой пары в порядке queries
+        """
+        salaries = [[0.0, 0, KLLSketch()] for query in queries]
+        by_city = queries_by_city(queries, salaries)
+        for name, salary, area_name, published_at in rows:
+            city_queries = by_city.get(area_name)
+            if city_queries is None or salary == "":
+                continue
+            avg_salary = float(salary)
+            if avg_salary > max_salary:
+                continue
+            for prof_name, prof_salary in city_queries:
+                if prof_name in name:
+                    prof_salary[0] += avg_salary
+                    prof_salary[1] += 1
+                    prof_salary[2].update(avg_salary)
+        return salaries
+
+    def get_salary_sketch(self, rows):
+        """Строит скетч всех непустых зарплат без отсечения выбросов для оценки порога выбросов
+
+            Args:
+                rows (iterable): Строки вакансий из CSVReader.iter_rows
+
+            Returns:
+                KLLSketch: Скетч зарплат
+        """
+        sketch = KLLSketch()
+        for name, salary, area_name, published_at in rows:
+            if salary != "":
+                sketch.update(float(salary))
+        return sketch
+
+    def get_batch_from_summary(self, queries, summary, salaries=None):
+        """Вычисляет статистические данные года для нескольких пар (профессия, город) по агрегатам
+        из get_summary за один просмотр групп. Скетчи агрегатов не изменяются, поэтому одни агрегаты
+        можно использовать для нескольких запросов
+
+            Args:
+                queries (list): Пары (профессия, город)
+                summary (dict): Агрегаты года
+                salaries (list): [сумма, количество, скетч] зарплат каждой пары из get_prof_salaries
+                    или None - суммы и количества по группам агрегатов с пустыми скетчами
+
+            Returns:
+                BatchAggregate: Статистические данные года всех пар и число вакансий
+        """
+        if salaries is None:
+            salaries = [[0.0, 0, KLLSketch()] for query in queries]
+            by_city = queries_by_city(queries, salaries)
+            for names, groups in summary["parts"]:
+                for area_name, city_queries in by_city.items():
+                    name_codes, sums, counts = groups.get(area_name, ((), (), ()))
+                    for name_code, group_sum, group_count in zip(name_codes, sums, counts):
+                        name = names[name_code]
+                        for prof_name, prof_salary in city_queries:
+                            if prof_name in name:
+                                prof_salary[0] += group_sum
+                                prof_salary[1] += group_count
+        return BatchAggregate.from_year(summary["year"], salaries, summary["cities"], summary["rows"])
+
+    def get_data_from_summary(self, prof_name, summary, city_name, salary=None):
+        """Вычисляет статистические данные года по агрегатам из get_summary
+
+            Args:
+                prof_name (str): Имя выбранной профессии
+                summary (dict): Агрегаты года
+                city_name (str): Имя выбранного города
+                salary (list): [сумма, количество, скетч] зарплат профессии из get_prof_salaries
+                    или None - сумма и количество по группам агрегатов с пустым скетчем
+
+            Returns:
+                Aggregate: Статистические данные года и число вакансий
+        """
+        salaries = [salary] if salary is not None else None
+        return self.get_batch_from_summary([(prof_name, city_name)], summary, salaries).aggregates()[0]
+
+def print_data(data, total_vacancies, verbose=True):
     """Обрабатывает вакансии и возвращает словари для создания таблиц, графиков и выводит данные этих словарей
 
             Args:
                 data (list): Статистические данные
                 total_vacancies (int): Общеее число вакансий
+                verbose (bool): Выводить данные словарей
             
             Returns:
                 [dict, dict]: Данные для создания таблиц и графиков
         """
+    log = print if verbose else lambda *args: None
     temp = {}
     salaryDict = []
     cityDict = []
     for x in data["salary"].keys():
-        if len(data["salary"][x]) == 0:
+        if data["salary"][x][1] == 0:
             temp[x] = 0
             continue
-        temp[x] = int(sum(data["salary"][x]) / len(data["salary"][x]))
-    print("Динамика уровня зарплат по годам:", temp)
+        temp[x] = int(data["salary"][x][0] / data["salary"][x][1])
+    log("Динамика уровня зарплат по годам:", temp)
     salaryDict.append(list(list(data["salary"].keys())[i] for i in range(len(data["salary"].keys()))))
     salaryDict.append(temp)
-    print("Динамика количества вакансий по годам:", data["amount"])
+    log("Динамика количества вакансий по годам:", data["amount"])
     salaryDict.append(data["amount"])
     temp = {list(data["salary"].keys())[i]: 0 for i in range(len(data["salary"].keys()))}
     for x in data["salary_prof"].keys():
-        if len(data["salary"][x]) == 0:
+        if data["salary"][x][1] == 0:
             temp[x] = 0
             continue
-        temp[x] = int(sum(data["salary_prof"][x]) / len(data["salary_prof"][x]))
-    print("Динамика уровня зарплат по годам для выбранной профессии:", temp)
+        temp[x] = int(data["salary_prof"][x][0] / data["salary_prof"][x][1])
+    log("Динамика уровня зарплат по годам для выбранной профессии:", temp)
     salaryDict.append(temp)
 
     if len(data["amount_prof"]) != 0:
-        print("Динамика количества вакансий по годам для выбранной профессии:", data["amount_prof"])
+        log("Динамика количества вакансий по годам для выбранной профессии:", data["amount_prof"])
         salaryDict.append(data["amount_prof"])
     else:
         temp = {list(data["salary"].keys())[i]: 0 for i in range(len(data["salary"].keys()))}
-        print("Динамика количества вакансий по годам для выбранной профессии:", temp)
+        log("Динамика количества вакансий по годам для выбранной профессии:", temp)
 
         salaryDict.append(temp)
 
@@ -480,11 +917,11 @@ def print_data(data, total_vacancies):
     if "Россия" in data["salary_city"]:
         data["salary_city"].pop("Россия")
     for x in data["salary_city"].keys():
-        percent = len(data["salary_city"][x]) / total_vacancies
+        percent = data["salary_city"][x][1] / total_vacancies
         if (percent >= 0.01):
-            temp[x] = int(sum(data["salary_city"][x]) / len(data["salary_city"][x]))
+            temp[x] = int(data["salary_city"][x][0] / data["salary_city"][x][1])
     temp = dict(sorted(temp.items(), key=lambda x: x[1], reverse=True)[:10])
-    print("Уровень зарплат по городам (в порядке убывания):", temp) 
+    log("Уровень зарплат по городам (в порядке убывания):", temp) 
     cityDict.append(temp)
     temp = {}
     if "Россия" in data["amount_city"]:
@@ -494,66 +931,881 @@ def print_data(data, total_vacancies):
         if (percent >= 0.01):
             temp[x] = round(percent, 4)
     temp = dict(sorted(temp.items(), key=lambda x: x[1], reverse=True)[:10])
-    print("Доля вакансий по городам (в порядке убывания):", temp)
+    log("Доля вакансий по городам (в порядке убывания):", temp)
     cityDict.append(temp)
     return [salaryDict, cityDict]
 
-def main_futures(file_names, prof_name, city_name):
-    """Обрабатывает и считывает вакансии в многопоточном режиме
+def compact_data(data):
+    """Сворачивает списки зарплат из результата DataWorker.get_data в агрегат с тройками [сумма, количество, скетч],
+    чтобы между процессами передавались только агрегаты, а не все зарплаты
+
+        Args:
+            data (list): Статистические данные одного года
+
+        Returns:
+            Aggregate: Статистические данные одного года со свернутыми зарплатами
+    """
+    year, salary_out, amount_out, salary_prof_out, amount_prof_out, cities_salary, cities_amount = data
+    return Aggregate.from_year(year, [sum(salary_out), len(salary_out), KLLSketch.from_values(salary_out)],
+                               [sum(salary_prof_out), len(salary_prof_out), KLLSketch.from_values(salary_prof_out)],
+                               {city: [sum(salaries), len(salaries), KLLSketch.from_values(salaries)]
+                                for city, salaries in cities_salary.items()})
+
+def salary_quantiles(data, cities=None, qs=(0.1, 0.5, 0.9)):
+    """Возвращает квантили зарплат по скетчам: по годам и за все годы для выбранной профессии и города,
+    по городам за все годы
+
+        Args:
+            data (dict): Статистические данные из Aggregate.to_data
+            cities (iterable): Города, для которых нужны квантили, None - все города
+            qs (tuple): Уровни квантилей
+
+        Returns:
+            dict: Квантили с ключами вида "p50"
+    """
+    def named(sketch):
+        return {"p%d" % round(q * 100): value for q, value in sketch.quantiles(qs).items()}
+
+    cities = data["salary_city"] if cities is None else cities
+    return {"salary_quantiles_by_year_prof": {year: named(salary[2]) for year, salary in data["salary_prof"].items()},
+            "salary_quantiles_prof": named(merge_sketches(salary[2] for salary in data["salary_prof"].values())),
+            "salary_quantiles_by_city": {city: named(data["salary_city"][city][2]) for city in cities
+                                         if city in data["salary_city"]}}
+
+def summary_key(cache, file_name, max_salary=MAX_SALARY, currency=None):
+    """Возвращает ключ кэша агрегатов файла с учетом порога выбросов и таблицы курсов
+
+        Args:
+            cache (AggregateCache): Дисковый кэш агрегатов
+            file_name (str): Название файла
+            max_salary (float): Порог выбросов
+            currency (CurrencyTable): Таблица курсов или None
+
+        Returns:
+            tuple: Ключ кэша
+    """
+    return cache.fingerprint(file_name, max_salary, currency.digest if currency is not None else None)
+
+def sketch_key(cache, file_name, currency=None):
+    """Возвращает ключ кэша скетча всех зарплат файла с учетом таблицы курсов
+
+        Args:
+            cache (AggregateCache): Дисковый кэш агрегатов
+            file_name (str): Название файла
+            currency (CurrencyTable): Таблица курсов или None
+
+        Returns:
+            tuple: Ключ кэша
+    """
+    return cache.fingerprint(file_name, "salary_sketch", currency.digest if currency is not None else None)
+
+def read_get_summary(file_name, engine="python", cache=None, max_salary=MAX_SALARY, currency=None):
+    """Возвращает агрегаты года для файла, используя кэш, если он передан
+
+        Args:
+            file_name (str): Название файла
+            engine (str): "python" - потоковая обработка строк, "numpy" - векторная обработка колонок,
+                чанки в колоночном формате всегда обрабатываются векторно
+            cache (AggregateCache): Дисковый кэш агрегатов
+            max_salary (float): Порог выбросов, входит в ключ кэша
+            currency (CurrencyTable): Таблица курсов для перевода зарплат в рубли, входит в ключ кэша
+
+        Returns:
+            dict: Агрегаты года из DataWorker.get_summary
+    """
+    key = summary_key(cache, file_name, max_salary, currency) if cache is not None else None
+    summary = get_cached_summary(cache, key) if cache is not None else None
+    if summary is not None:
+        return summary
+    if engine == "numpy" or file_name.endswith(chuncker.COLUMNAR_SUFFIX):
+        import vectorized
+        summary = vectorized.get_summary(vectorized.load(file_name, currency), max_salary)
+    else:
+        summary = DataWorker().get_summary(CSVReader().iter_rows(file_name, currency=currency), max_salary)
+    if cache is not None:
+        put_summary(cache, key, summary)
+    return summary
+
+def get_cached_summary(cache, key):
+    """Собирает агрегаты года из заголовка и частей, сохраненных put_summary
+
+        Args:
+            cache (AggregateCache): Дисковый кэш агрегатов
+            key (tuple): Ключ заголовка из summary_key
+
+        Returns:
+            dict: Агрегаты года как у DataWorker.get_summary или None, если заголовка или одной из частей нет в кэше
+    """
+    head = cache.get(key)
+    if head is None:
+        return None
+    parts = [cache.get(part_key) for part_key, size in head["part_keys"]]
+    if None in parts:
+        return None
+    return {"year": head["year"], "rows": head["rows"], "cities": head["cities"], "parts": parts}
+
+def put_summary(cache, key, summary, head=None):
+    """Сохраняет агрегаты года в кэш: заголовок с годом, числом вакансий, агрегатами по городам и ключами частей
+    и массивы пар отдельными записями-частями. При дозаписи в чанк передается заголовок до дозаписи
+    и агрегаты только дописанных вакансий: агрегаты по городам добавляются в заголовок на месте, а пары
+    сохраняются новой частью, прежние части не переписываются. Последние части не больше новой сливаются с ней,
+    поэтому частей O(log) от числа дозаписей и каждая пара переписывается O(log) раз
+
+        Args:
+            cache (AggregateCache): Дисковый кэш агрегатов
+            key (tuple): Ключ заголовка из summary_key
+            summary (dict): Агрегаты из DataWorker.get_summary, их скетчи переносятся в заголовок без копирования
+            head (dict): Заголовок из кэша до дозаписи, изменяется на месте, None - сохранить агрегаты целиком
+
+        Returns:
+            bool: False, если одной из сливаемых частей уже нет в кэше и заголовок не сохранен
+    """
+    if head is None:
+        head = {"year": None, "rows": 0, "cities": {}, "part_keys": []}
+    part_keys = head["part_keys"]
+    for names, groups in summary["parts"]:
+        size = count_groups(groups)
+        while part_keys and part_keys[-1][1] <= size:
+            older = cache.get(part_keys[-1][0])
+            if older is None:
+                return False
+            part_keys.pop()
+            names, groups = pack_groups(unpack_groups(names, groups, unpack_groups(*older)))
+            size = count_groups(groups)
+        part_key = ("summary_part", len(part_keys)) + key
+        cache.put(part_key, (names, groups))
+        part_keys.append((part_key, size))
+    if head["year"] is None:
+        head["year"] = summary["year"]
+    head["rows"] += summary["rows"]
+    merge_stats(head["cities"], summary["cities"], copy=False)
+    cache.put(key, head)
+    return True
+
+def read_get_salary_sketch(file_name, engine="python", cache=None, currency=None):
+    """Возвращает скетч всех зарплат файла без отсечения выбросов, используя кэш, если он передан
+
+        Args:
+            file_name (str): Название файла
+            engine (str): "python" - потоковая обработка строк, "numpy" - векторная обработка колонок
+            cache (AggregateCache): Дисковый кэш агрегатов
+            currency (CurrencyTable): Таблица курсов для перевода зарплат в рубли
+
+        Returns:
+            KLLSketch: Скетч зарплат
+    """
+    key = sketch_key(cache, file_name, currency) if cache is not None else None
+    sketch = cache.get(key) if cache is not None else None
+    if sketch is None:
+        if engine == "numpy" or file_name.endswith(chuncker.COLUMNAR_SUFFIX):
+            import vectorized
+            sketch = vectorized.get_salary_sketch(vectorized.load(file_name, currency))
+        else:
+            sketch = DataWorker().get_salary_sketch(CSVReader().iter_rows(file_name, currency=currency))
+        if cache is not None:
+            cache.put(key, sketch)
+    return sketch
+
+def read_get_prof_salaries(queries, file_name, engine="python", max_salary=MAX_SALARY, currency=None):
+    """Считает суммы, количества и скетчи зарплат нескольких пар (профессия, город) проходом по строкам файла.
+    Агрегаты в кэше хранят скетчи только по городам, поэтому квантили профессий считаются этим проходом:
+    в колоночном чанке просматриваются только подходящие строки, csv файл читается один раз для всех пар
+
+        Args:
+            queries (list): Пары (профессия, город)
+            file_name (str): Название файла
+            engine (str): "python" - потоковая обработка строк, "numpy" - векторная обработка колонок
+            max_salary (float): Порог выбросов, зарплаты выше него не учитываются
+            currency (CurrencyTable): Таблица курсов для перевода зарплат в рубли
+
+        Returns:
+            list: [сумма, количество, скетч] зарплат для каждой пары в порядке queries
+    """
+    if engine == "numpy" or file_name.endswith(chuncker.COLUMNAR_SUFFIX):
+        import vectorized
+        return vectorized.get_prof_salaries(queries, vectorized.load(file_name, currency), max_salary)
+    return DataWorker().get_prof_salaries(queries, CSVReader().iter_rows(file_name, currency=currency), max_salary)
+
+def cube_key(cache, file_name, max_salary=MAX_SALARY, currency=None):
+    """Возвращает ключ кэша куба файла с учетом порога выбросов и таблицы курсов
+
+        Args:
+            cache (AggregateCache): Дисковый кэш агрегатов
+            file_name (str): Название файла
+            max_salary (float): Порог выбросов
+            currency (CurrencyTable): Таблица курсов или None
+
+        Returns:
+            tuple: Ключ кэша
+    """
+    return cache.fingerprint(file_name, "cube", max_salary, currency.digest if currency is not None else None)
+
+def read_get_cube(file_name, cache=None, max_salary=MAX_SALARY, currency=None):
+    """Возвращает куб (месяц, город, опыт) для файла, используя кэш, если он передан.
+    Колоночные чанки обрабатываются векторно
+
+        Args:
+            file_name (str): Название файла
+            cache (AggregateCache): Дисковый кэш агрегатов
+            max_salary (float): Порог выбросов, входит в ключ кэша
+            currency (CurrencyTable): Таблица курсов для перевода зарплат в рубли, входит в ключ кэша
+
+        Returns:
+            Cube: Куб года
+    """
+    key = cube_key(cache, file_name, max_salary, currency) if cache is not None else None
+    year_cube = cache.get(key) if cache is not None else None
+    if year_cube is None:
+        if file_name.endswith(chuncker.COLUMNAR_SUFFIX):
+            import vectorized
+            year_cube = vectorized.get_cube(vectorized.load(file_name, currency), max_salary)
+        else:
+            year_cube = cube.get_cube(CSVReader().iter_rows(file_name, currency=currency,
+                                                            extra_fields=("experience_id",)), max_salary)
+        if cache is not None:
+            cache.put(key, year_cube)
+    return year_cube
+
+def collect_cube(file_names, mode="thread", cache=None, tracer=None, max_salary=MAX_SALARY, currency=None):
+    """Строит кубы годовых файлов в пуле и объединяет их в один куб
 
         Args:
             file_names(list): Названия файлов
+            mode (str): "thread" - пул потоков, "process" - пул процессов по числу ядер
+            cache (AggregateCache): Дисковый кэш агрегатов годовых файлов
+            tracer (Tracer): Трассировщик этапов или None
+            max_salary (float): Порог выбросов, зарплаты выше него не учитываются
+            currency (CurrencyTable): Таблица курсов для перевода зарплат в рубли
+
+        Returns:
+            Cube: Куб всех файлов
+    """
+    cubes = map_files(partial(read_get_cube, cache=cache, max_salary=max_salary, currency=currency), file_names, mode,
+                      tracer, lambda year_cube: year_cube.rows)
+    result = cube.Cube()
+    with profiling.stage(tracer, "merge"):
+        for year_cube in sorted(cubes, key=lambda year_cube: min((month for cells in year_cube.cells.values()
+                                                                  for month, experience in cells), default="")):
+            result.merge(year_cube)
+    return result
+
+def salary_cutoff(file_names, mode="thread", engine="python", cache=None, tracer=None, fence=3.0, currency=None):
+    """Оценивает порог выбросов по объединенному скетчу зарплат всех годов вместо фиксированного MAX_SALARY.
+    При переданном кэше порог запоминается для папки чанков, и пока новая оценка отличается от него
+    не больше чем на CUTOFF_TOLERANCE, возвращается прежний порог: ошибка скетча сравнима с этим допуском,
+    а агрегаты с прежним порогом после дозаписи уже обновлены в кэше
+
+        Args:
+            file_names (list): Названия файлов
+            mode (str): "thread" - пул потоков, "process" - пул процессов по числу ядер
+            engine (str): "python" - потоковая обработка строк, "numpy" - векторная обработка колонок
+            cache (AggregateCache): Дисковый кэш агрегатов годовых файлов
+            tracer (Tracer): Трассировщик этапов или None
+            fence (float): Ширина ограды Тьюки в межквартильных размахах логарифма зарплаты
+            currency (CurrencyTable): Таблица курсов для перевода зарплат в рубли
+
+        Returns:
+            float: Порог выбросов
+    """
+    sketches = map_files(partial(read_get_salary_sketch, engine=engine, cache=cache, currency=currency), file_names,
+                         mode, tracer, len)
+    with profiling.stage(tracer, "cutoff"):
+        cutoff = robust_cutoff(merge_sketches(sketches), fence)
+    if cache is None or math.isinf(cutoff):
+        return cutoff
+    key = ("cutoff", sorted({os.path.abspath(os.path.dirname(file)) for file in file_names}), fence,
+           currency.digest if currency is not None else None)
+    previous = cache.get(key)
+    if previous is not None and abs(math.log(cutoff / previous)) <= CUTOFF_TOLERANCE:
+        return previous
+    cache.put(key, cutoff)
+    return cutoff
+
+def read_get_delta(file_name, offset, currency=None, max_salary=MAX_SALARY):
+    """Считает агрегаты, скетч всех зарплат и куб только для вакансий, дописанных в чанк после offset,
+    дописанная часть читается один раз. При offset = 0 считается весь чанк
+
+        Args:
+            file_name (str): Название файла или папки чанка
+            offset (int): Размер чанка до дозаписи из chuncker.сsv_chuncker
+            currency (CurrencyTable): Таблица курсов для перевода зарплат в рубли
+            max_salary (float): Порог выбросов агрегатов
+
+        Returns:
+            (dict, KLLSketch, Cube): Агрегаты дописанных вакансий, скетч их зарплат без отсечения выбросов
+                и их куб (месяц, город, опыт)
+    """
+    if file_name.endswith(chuncker.COLUMNAR_SUFFIX):
+        import vectorized
+        columns = vectorized.tail(vectorized.load(file_name, currency), offset)
+        return (vectorized.get_summary(columns, max_salary), vectorized.get_salary_sketch(columns),
+                vectorized.get_cube(columns, max_salary))
+    sketch = KLLSketch()
+    delta_cube = cube.Cube()
+
+    def rows():
+        for name, salary, area_name, published_at, experience in CSVReader().iter_rows(
+                file_name, offset, currency, ("experience_id",)):
+            if salary != "":
+                sketch.update(float(salary))
+            delta_cube.add_vacancy(salary, area_name, published_at, experience, max_salary)
+            yield name, salary, area_name, published_at
+
+    return DataWorker().get_summary(rows(), max_salary), sketch, delta_cube
+
+def ingest(file_name, out_dir="csv", fmt="csv", cache=None, currency=None, workers=1, compression="",
+           dedup_rate=None, max_salary=MAX_SALARY):
+    """Дописывает вакансии новой выгрузки в годовые чанки и обновляет в кэше агрегаты и куб (месяц, город, опыт)
+    с порогом max_salary и скетчи всех зарплат изменившихся годов. Если все три записи чанка были в кэше,
+    разбираются только новые вакансии и их агрегаты добавляются к записям на месте, а пары сохраняются новой
+    частью (см. put_summary), поэтому стоимость пропорциональна размеру выгрузки, а не всей истории;
+    изменившиеся чанки только хэшируются для ключей кэша. Иначе чанк целиком разбирается один раз
+
+        Args:
+            file_name (str): Название файла новой выгрузки
+            out_dir (str): Папка с чанками
+            fmt (str): "csv" - csv файлы, "columnar" - бинарный колоночный формат
+            cache (AggregateCache): Кэш агрегатов или None - только дописать вакансии в чанки
+            currency (CurrencyTable): Таблица курсов для перевода зарплат в рубли
+            workers (int): Число процессов для разбивки выгрузки на чанки
+            compression (str): Расширение сжатия csv чанков (".gz", ".xz", ".bz2"), "" - без сжатия
+            dedup_rate (float): Вероятность принять новую вакансию за дубликат, None - без дедупликации
+            max_salary (float): Порог выбросов обновляемых агрегатов, для --outlier-filter sketch -
+                порог до дозаписи из salary_cutoff
+
+        Returns:
+            list: Пути до изменившихся чанков
+    """
+    if cache is None:
+        return list(chuncker.сsv_chuncker(file_name, out_dir, fmt=fmt, append=True, workers=workers,
+                                          compression=compression, dedup_rate=dedup_rate))
+    before = {}
+    if os.path.isdir(out_dir):
+        before = {os.path.normpath(chunk): (summary_key(cache, chunk, max_salary, currency),
+                                            sketch_key(cache, chunk, currency),
+                                            cube_key(cache, chunk, max_salary, currency))
+                  for chunk in chunks(out_dir, fmt, compression)}
+    appended = chuncker.сsv_chuncker(file_name, out_dir, fmt=fmt, append=True, workers=workers,
+                                     compression=compression, dedup_rate=dedup_rate)
+    for chunk, offset in appended.items():
+        keys = before.get(os.path.normpath(chunk))
+        cached = [cache.get(key) for key in keys] if keys is not None and offset else None
+        key = summary_key(cache, chunk, max_salary, currency)
+        head = None
+        if cached is not None and None not in cached:
+            head, sketch, year_cube = cached
+            delta, delta_sketch, delta_cube = read_get_delta(chunk, offset, currency, max_salary)
+            if put_summary(cache, key, delta, head):
+                sketch.merge(delta_sketch)
+                year_cube.merge(delta_cube, copy=False)
+            else:
+                head = None
+        if head is None:
+            summary, sketch, year_cube = read_get_delta(chunk, 0, currency, max_salary)
+            put_summary(cache, key, summary)
+        cache.put(sketch_key(cache, chunk, currency), sketch)
+        cache.put(cube_key(cache, chunk, max_salary, currency), year_cube)
+    return list(appended)
+
+def read_get_data(prof_name, city_name, file_name, engine="python", cache=None, max_salary=MAX_SALARY,
+                  currency=None, sketch=True):
+    """Считывает и обрабатывает вакансии одного файла
+
+        Args:
             prof_name (str): Имя выбранной профессии
+            city_name (str): Имя выбранного города
+            file_name (str): Название файла
+            engine (str): "python" - потоковая обработка строк, "numpy" - векторная обработка колонок,
+                чанки в колоночном формате всегда обрабатываются векторно
+            cache (AggregateCache): Дисковый кэш агрегатов, при его наличии файл читается только при промахе
+            max_salary (float): Порог выбросов, зарплаты выше него не учитываются
+            currency (CurrencyTable): Таблица курсов для перевода зарплат в рубли
+            sketch (bool): Нужен скетч зарплат профессии для квантилей. В кэше скетчи есть только по городам,
+                поэтому с кэшем скетч профессии строится проходом по строкам файла
+
+        Returns:
+            Aggregate: Статистические данные года и число вакансий в файле
+    """
+    if cache is not None:
+        summary = read_get_summary(file_name, engine, cache, max_salary, currency)
+        salary = None
+        if sketch:
+            salary = read_get_prof_salaries([(prof_name, city_name)], file_name, engine, max_salary, currency)[0]
+        return DataWorker().get_data_from_summary(prof_name, summary, city_name, salary)
+    if engine == "numpy" or file_name.endswith(chuncker.COLUMNAR_SUFFIX):
+        import vectorized
+        return vectorized.get_data(prof_name, vectorized.load(file_name, currency), city_name, max_salary)
+    dataWorker = DataWorker()
+    csvReader = CSVReader()
+    return dataWorker.get_data_stream(prof_name, csvReader.iter_rows(file_name, currency=currency), city_name,
+                                      max_salary)
+
+def read_get_batch_data(queries, file_name, engine="python", cache=None, max_salary=MAX_SALARY, currency=None,
+                        sketch=True):
+    """Считывает и обрабатывает вакансии одного файла сразу для нескольких пар (профессия, город),
+    файл читается один раз
+
+        Args:
+            queries (list): Пары (профессия, город)
+            file_name (str): Название файла
+            engine (str): "python" - потоковая обработка строк, "numpy" - векторная обработка колонок,
+                чанки в колоночном формате всегда обрабатываются векторно
+            cache (AggregateCache): Дисковый кэш агрегатов, при его наличии файл читается только при промахе
+            max_salary (float): Порог выбросов, зарплаты выше него не учитываются
+            currency (CurrencyTable): Таблица курсов для перевода зарплат в рубли
+            sketch (bool): Нужны скетчи зарплат профессий для квантилей, с кэшем они строятся
+                одним проходом по строкам файла для всех пар
+
+        Returns:
+            BatchAggregate: Статистические данные года всех пар и число вакансий в файле
+    """
+    if cache is not None:
+        summary = read_get_summary(file_name, engine, cache, max_salary, currency)
+        salaries = read_get_prof_salaries(queries, file_name, engine, max_salary, currency) if sketch else None
+        return DataWorker().get_batch_from_summary(queries, summary, salaries)
+    if engine == "numpy" or file_name.endswith(chuncker.COLUMNAR_SUFFIX):
+        import vectorized
+        return vectorized.get_batch_data(queries, vectorized.load(file_name, currency), max_salary)
+    return DataWorker().get_batch_data_stream(queries, CSVReader().iter_rows(file_name, currency=currency),
+                                              max_salary)
+
+def get_executor(mode):
+    """Создает пул для обработки годовых файлов
+
+        Args:
+            mode (str): "thread" - пул потоков, "process" - пул процессов по числу ядер
+
+        Returns:
+            concurrent.futures.Executor: Пул
     """
-    def read_get_data(prof_name, city_name, file_name):
-        dataWorker = DataWorker()
-        csvReader = CSVReader()
-        vacancies = csvReader.get_vacancies(file_name)
-        return [dataWorker.get_data(prof_name, vacancies, city_name), len(vacancies[1])]
+    if mode == "process":
+        return concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count())
+    if mode == "thread":
+        return concurrent.futures.ThreadPoolExecutor(max_workers=10)
+    raise ValueError("Неизвестный режим: " + mode)
+
+def map_files(function, file_names, mode="thread", tracer=None, rows=None):
+    """Выполняет функцию для каждого годового файла в пуле
+
+        Args:
+            function (callable): Функция, принимающая название файла
+            file_names (list): Названия файлов
+            mode (str): "thread" - пул потоков, "process" - пул процессов по числу ядер
+            tracer (Tracer): Трассировщик для замеров по каждому файлу или None
+            rows (callable): Возвращает число вакансий по результату функции для замера
 
-    years = []
-    total_vacancies = 0
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        queue = {executor.submit(partial(read_get_data, prof_name, city_name), file_name): file_name for file_name in file_names}
+        Returns:
+            list: Результаты функции в порядке завершения
+    """
+    results = []
+    with get_executor(mode) as executor:
+        if tracer is None:
+            queue = {executor.submit(function, file_name): file_name for file_name in file_names}
+        else:
+            queue = {executor.submit(profiling.measure, "read", function, file_name,
+                                     profile_dir=tracer.profile_dir, file=file_name): file_name
+                     for file_name in file_names}
         for answer in concurrent.futures.as_completed(queue):
             result = answer.result()
-            years.append(result[0])
-            total_vacancies += result[1]
-            years = sorted(years, key=lambda year: year[0])
-
-    cities_salary = {}
-    cities_amount = {}
-   
-    for year in years:
-        city_salary = year[5]
-        for city in city_salary:
-            city = city
-            if city not in cities_salary:
-                cities_salary[city] = city_salary[city]
-            else:
-                cities_salary[city] += city_salary[city]
+            if tracer is not None:
+                result, record = result
+                tracer.add(record, rows(result) if rows is not None else None, profiling.path_size(queue[answer]))
+            results.append(result)
+    return results
 
-        city_amount = year[6]
-        for city in city_amount:
-            if city not in cities_amount:
-                cities_amount[city] = city_amount[city]
-            else:
-                cities_amount[city] += city_amount[city]
-
-    dict = {"salary": {x[0]:x[1] for x in years},
-            "amount": {x[0]:x[2] for x in years},
-            "salary_prof": {x[0]:x[3] for x in years},
-            "amount_prof": {x[0]:x[4] for x in years},
-            "salary_city": cities_salary,
-            "amount_city": cities_amount}
-    options = {'enable-local-file-access': None}
-    config = pdfkit.configuration(wkhtmltopdf=r'C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe')
-    report = Report("graph.jpg", print_data(dict, total_vacancies), prof_name, city_name)
-    pdfkit.from_string(report.html, 'report.pdf', configuration=config, options=options)
+def reduce_files(function, file_names, mode="thread", tracer=None, empty=None):
+    """Выполняет функцию для каждого годового файла в пуле и объединяет агрегаты деревом в том же пуле:
+    как только готовы два соседних узла дерева, их объединение отправляется в пул, поэтому объединение идет
+    параллельно с чтением оставшихся файлов, а глубина дерева - log2(числа файлов). Форма дерева задается
+    порядком file_names, поэтому результат, включая скетчи, совпадает с tree_reduce и не зависит от порядка
+    завершения задач
+
+        Args:
+            function (callable): Функция, принимающая название файла и возвращающая Aggregate или BatchAggregate
+            file_names (list): Названия файлов
+            mode (str): "thread" - пул потоков, "process" - пул процессов по числу ядер
+            tracer (Tracer): Трассировщик для замеров по каждому файлу или None
+            empty (object): Результат для пустого списка файлов, по умолчанию Aggregate()
+
+        Returns:
+            Aggregate: Объединенный агрегат того же типа, что и результаты функции
+    """
+    sizes = [len(file_names)]
+    while sizes[-1] > 1:
+        sizes.append((sizes[-1] + 1) // 2)
+    nodes = {}
+    root = empty if empty is not None else Aggregate()
+    with get_executor(mode) as executor:
+        if tracer is None:
+            reads = {executor.submit(function, file_name): file_name for file_name in file_names}
+        else:
+            reads = {executor.submit(profiling.measure, "read", function, file_name,
+                                     profile_dir=tracer.profile_dir, file=file_name): file_name
+                     for file_name in file_names}
+        positions = {answer: (0, index) for index, answer in enumerate(reads)}
+        pending = set(reads)
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for answer in done:
+                result = answer.result()
+                if tracer is not None and answer in reads:
+                    result, record = result
+                    tracer.add(record, result.rows, profiling.path_size(reads[answer]))
+                level, index = positions.pop(answer)
+                while level + 1 < len(sizes) and index ^ 1 >= sizes[level]:
+                    level, index = level + 1, index // 2
+                if level + 1 == len(sizes):
+                    root = result
+                elif (level, index ^ 1) in nodes:
+                    other = nodes.pop((level, index ^ 1))
+                    left, right = (other, result) if index & 1 else (result, other)
+                    merged = executor.submit(type(result).merge, left, right)
+                    positions[merged] = (level + 1, index // 2)
+                    pending.add(merged)
+                else:
+                    nodes[(level, index)] = result
+    return root
+
+def merge_years(years):
+    """Объединяет агрегаты годов в словарь для print_data, исходные агрегаты не изменяются
+
+        Args:
+            years (list): Агрегаты годов
+
+        Returns:
+            dict: Статистические данные
+    """
+    return tree_reduce(years).to_data()
+
+def save_report(data, total_vacancies, prof_name, city_name, pdf_name='report.pdf', tracer=None, renderer=None,
+                verbose=True):
+    """Создает отчет и сохраняет его в PDF
+
+        Args:
+            data (dict): Статистические данные
+            total_vacancies (int): Общее число вакансий
+            prof_name (str): Имя выбранной профессии
+            city_name (str): Имя выбранного города
+            pdf_name (str): Имя PDF файла
+            tracer (Tracer): Трассировщик этапов или None
+            renderer (PdfRenderer): Способ сохранения PDF, по умолчанию PdfRenderer()
+            verbose (bool): Выводить статистику в stdout
+    """
+    with profiling.stage(tracer, "print_data", report=pdf_name):
+        dicts = print_data(data, total_vacancies, verbose)
+    with profiling.stage(tracer, "graph", report=pdf_name):
+        report = Report("graph.jpg", dicts, prof_name, city_name)
+    renderer = renderer if renderer is not None else PdfRenderer()
+    with profiling.stage(tracer, "pdf", report=pdf_name, backend=renderer.backend):
+        renderer.render(report, pdf_name)
+
+def collect_data(file_names, prof_name, city_name, mode="thread", engine="python", cache=None, tracer=None,
+                 max_salary=MAX_SALARY, currency=None, sketch=True):
+    """Обрабатывает годовые файлы и объединяет статистические данные для пары (профессия, город)
+
+        Args:
+            file_names(list): Названия файлов
+            prof_name (str): Имя выбранной профессии
+            city_name (str): Имя выбранного города
+            mode (str): "thread" - пул потоков, "process" - пул процессов по числу ядер
+            engine (str): "python" - потоковая обработка строк, "numpy" - векторная обработка колонок
+            cache (AggregateCache): Дисковый кэш агрегатов годовых файлов
+            tracer (Tracer): Трассировщик этапов или None
+            max_salary (float): Порог выбросов, зарплаты выше него не учитываются
+            currency (CurrencyTable): Таблица курсов для перевода зарплат в рубли
+            sketch (bool): Нужны скетчи зарплат профессии для квантилей, см. read_get_data
+
+        Returns:
+            (dict, int): Статистические данные для print_data и общее число вакансий
+    """
+    aggregate = reduce_files(partial(read_get_data, prof_name, city_name, engine=engine, cache=cache,
+                                     max_salary=max_salary, currency=currency, sketch=sketch), file_names, mode,
+                             tracer)
+    with profiling.stage(tracer, "merge"):
+        data = aggregate.to_data()
+    return data, aggregate.rows
+
+def collect_batch_data(file_names, queries, mode="thread", engine="python", cache=None, tracer=None,
+                       max_salary=MAX_SALARY, currency=None, sketch=True):
+    """Обрабатывает каждый годовой файл один раз и вычисляет статистические данные для всех пар (профессия, город).
+    Результаты файлов объединяются деревом по мере готовности, как в collect_data, поэтому агрегаты всех годов
+    не держатся в памяти одновременно
+
+        Args:
+            file_names(list): Названия файлов
+            queries (list): Пары (профессия, город)
+            mode (str): "thread" - пул потоков, "process" - пул процессов по числу ядер
+            engine (str): "python" - потоковая обработка строк, "numpy" - векторная обработка колонок
+            cache (AggregateCache): Дисковый кэш агрегатов годовых файлов
+            tracer (Tracer): Трассировщик этапов или None
+            max_salary (float): Порог выбросов, зарплаты выше него не учитываются
+            currency (CurrencyTable): Таблица курсов для перевода зарплат в рубли
+            sketch (bool): Нужны скетчи зарплат профессий для квантилей, см. read_get_batch_data
+
+        Returns:
+            list: Пары (статистические данные, общее число вакансий) в порядке queries
+    """
+    batch = reduce_files(partial(read_get_batch_data, queries, engine=engine, cache=cache, max_salary=max_salary,
+                                 currency=currency, sketch=sketch), file_names, mode, tracer,
+                         BatchAggregate(len(queries)))
+    with profiling.stage(tracer, "merge", reports=len(queries)):
+        return [(aggregate.to_data(), aggregate.rows) for aggregate in batch.aggregates()]
+
+def stats_json(dicts, prof_name, city_name):
+    """Переводит словари из print_data в словарь с понятными ключами для вывода в JSON
+
+        Args:
+            dicts (list): Данные из print_data
+            prof_name (str): Имя выбранной профессии
+            city_name (str): Имя выбранного города
+
+        Returns:
+            dict: Статистика по годам и городам
+    """
+    salaryDict, cityDict = dicts
+    return {"prof_name": prof_name,
+            "city_name": city_name,
+            "years": salaryDict[0],
+            "salary_by_year": salaryDict[1],
+            "vacancies_by_year": salaryDict[2],
+            "salary_by_year_prof": salaryDict[3],
+            "vacancies_by_year_prof": salaryDict[4],
+            "salary_by_city": cityDict[0],
+            "vacancies_share_by_city": cityDict[1]}
+
+def query_stats(data, total_vacancies, prof_name, city_name, max_salary=MAX_SALARY):
+    """Вычисляет статистику одной пары (профессия, город) для вывода в JSON
+
+        Args:
+            data (dict): Статистические данные
+            total_vacancies (int): Общее число вакансий
+            prof_name (str): Имя выбранной профессии
+            city_name (str): Имя выбранного города
+            max_salary (float): Порог выбросов, с которым посчитаны данные
+
+        Returns:
+            dict: Статистика из stats_json и salary_quantiles
+    """
+    stats = stats_json(print_data(data, total_vacancies, verbose=False), prof_name, city_name)
+    stats["max_salary"] = max_salary
+    stats.update(salary_quantiles(data, stats["salary_by_city"]))
+    return stats
+
+def main_stats(file_names, queries, mode="thread", engine="python", cache=None, tracer=None, max_salary=MAX_SALARY,
+               currency=None):
+    """Вычисляет статистику без построения графиков и PDF, библиотеки отчетов не импортируются.
+    Кроме средних выводятся квантили зарплат по скетчам
+
+        Args:
+            file_names(list): Названия файлов
+            queries (list): Пары (профессия, город)
+            mode (str): "thread" - пул потоков, "process" - пул процессов по числу ядер
+            engine (str): "python" - потоковая обработка строк, "numpy" - векторная обработка колонок
+            cache (AggregateCache): Дисковый кэш агрегатов годовых файлов
+            tracer (Tracer): Трассировщик этапов или None
+            max_salary (float): Порог выбросов, зарплаты выше него не учитываются
+            currency (CurrencyTable): Таблица курсов для перевода зарплат в рубли
+
+        Returns:
+            list: Статистика из stats_json и salary_quantiles для каждой пары
+    """
+    if len(queries) == 1:
+        results = [collect_data(file_names, queries[0][0], queries[0][1], mode, engine, cache, tracer, max_salary,
+                                currency)]
+    else:
+        results = collect_batch_data(file_names, queries, mode, engine, cache, tracer, max_salary, currency)
+    stats = []
+    for (prof_name, city_name), (data, total_vacancies) in zip(queries, results):
+        with profiling.stage(tracer, "print_data", report=report_name(prof_name, city_name)):
+            stats.append(query_stats(data, total_vacancies, prof_name, city_name, max_salary))
+    return stats
+
+def main_futures(file_names, prof_name, city_name, mode="thread", engine="python", cache=None, tracer=None,
+                 renderer=None, max_salary=MAX_SALARY, currency=None):
+    """Обрабатывает и считывает вакансии в многопоточном или многопроцессном режиме
+
+        Args:
+            file_names(list): Названия файлов
+            prof_name (str): Имя выбранной профессии
+            city_name (str): Имя выбранного города
+            mode (str): "thread" - пул потоков, "process" - пул процессов по числу ядер
+            engine (str): "python" - потоковая обработка строк, "numpy" - векторная обработка колонок,
+                чанки в колоночном формате всегда обрабатываются векторно
+            cache (AggregateCache): Дисковый кэш агрегатов годовых файлов
+            tracer (Tracer): Трассировщик этапов или None
+            renderer (PdfRenderer): Способ сохранения PDF, по умолчанию PdfRenderer()
+            max_salary (float): Порог выбросов, зарплаты выше него не учитываются
+            currency (CurrencyTable): Таблица курсов для перевода зарплат в рубли
+    """
+    data, total_vacancies = collect_data(file_names, prof_name, city_name, mode, engine, cache, tracer, max_salary,
+                                         currency, sketch=False)
+    save_report(data, total_vacancies, prof_name, city_name, tracer=tracer, renderer=renderer)
+
+def report_name(prof_name, city_name):
+    """Возвращает имя PDF файла отчета для пары (профессия, город)
+
+        Args:
+            prof_name (str): Имя профессии
+            city_name (str): Имя города
+
+        Returns:
+            str: Имя PDF файла
+    >>> report_name("Программист", "Москва")
+    'report_Программист_Москва.pdf'
+    >>> report_name("C++/Qt", "Нижний Новгород")
+    'report_C___Qt_Нижний_Новгород.pdf'
+    """
+    return "report_" + re.sub(r"\W", "_", prof_name) + "_" + re.sub(r"\W", "_", city_name) + ".pdf"
+
+def main_batch(file_names, queries, mode="thread", engine="python", cache=None, tracer=None, renderer=None,
+               max_salary=MAX_SALARY, currency=None):
+    """Строит отчеты для нескольких пар (профессия, город) за один проход по годовым файлам:
+    при чтении каждого файла обновляются данные всех запросов
+
+        Args:
+            file_names(list): Названия файлов
+            queries (list): Пары (профессия, город)
+            mode (str): "thread" - пул потоков, "process" - пул процессов по числу ядер
+            engine (str): "python" - потоковая обработка строк, "numpy" - векторная обработка колонок
+            cache (AggregateCache): Дисковый кэш агрегатов годовых файлов
+            tracer (Tracer): Трассировщик этапов или None
+            renderer (PdfRenderer): Способ сохранения PDF, по умолчанию PdfRenderer(),
+                отчеты сохраняются параллельно в его пуле
+            max_salary (float): Порог выбросов, зарплаты выше него не учитываются
+            currency (CurrencyTable): Таблица курсов для перевода зарплат в рубли
+
+        Returns:
+            list: Имена созданных PDF файлов
+    """
+    jobs = []
+    results = collect_batch_data(file_names, queries, mode, engine, cache, tracer, max_salary, currency, sketch=False)
+    for (prof_name, city_name), (data, total_vacancies) in zip(queries, results):
+        with profiling.stage(tracer, "print_data", report=report_name(prof_name, city_name)):
+            jobs.append((print_data(data, total_vacancies), prof_name, city_name))
+
+    with profiling.stage(tracer, "graph", reports=len(jobs)):
+        images = render_graphs(jobs, mode)
+    reports = [Report("graph.jpg", dicts, prof_name, city_name, image)
+               for (dicts, prof_name, city_name), image in zip(jobs, images)]
+    renderer = renderer if renderer is not None else PdfRenderer()
+    with profiling.stage(tracer, "pdf", reports=len(reports), backend=renderer.backend):
+        return renderer.render_many(reports, [report_name(prof_name, city_name) for dicts, prof_name, city_name in jobs])
+
+def read_queries(file_name):
+    """Считывает пары (профессия, город) из csv файла без заголовка
+
+        Args:
+            file_name (str): Название файла
+
+        Returns:
+            list: Пары (профессия, город)
+    """
+    with open(file_name, encoding="UTF-8-sig", newline='') as File:
+        return [(row[0], row[1]) for row in csv.reader(File) if row]
 
 if __name__ == "__main__":
-    file_name = input("Введите название файла: ")
-    prof_name = input("Введите название профессии: ")
-    city_name = input("Введите название города: ")
-    chuncker.сsv_chuncker(file_name)
-    main_futures(list(files("csv")), prof_name, city_name)
+    parser = argparse.ArgumentParser(description="Аналитика вакансий по годам и городам")
+    parser.add_argument("file_name", nargs="?", help="csv файл с вакансиями")
+    parser.add_argument("--prof", help="название профессии")
+    parser.add_argument("--city", help="название города")
+    parser.add_argument("--queries", help="csv файл с парами профессия,город для пакетного режима")
+    parser.add_argument("--mode", choices=["thread", "process"], default="thread")
+    parser.add_argument("--engine", choices=["python", "numpy"], default="python")
+    parser.add_argument("--format", choices=["csv", "columnar"], default="csv", help="формат годовых чанков")
+    parser.add_argument("--append", action="store_true",
+                        help="дописать файл к существующим чанкам вместо полной перезаписи, с --cache обновить агрегаты")
+    parser.add_argument("--cache", metavar="DIR",
+                        help="папка дискового кэша агрегатов годовых чанков, без нее чанки читаются при каждом запуске")
+    parser.add_argument("--cache-size", type=int, default=256, help="предельный размер кэша в мегабайтах")
+    parser.add_argument("--skip-chunking", action="store_true", help="использовать уже созданные чанки из папки csv")
+    parser.add_argument("--chunk-workers", type=int, default=os.cpu_count(),
+                        help="число процессов для разбивки большого файла на чанки, 1 - без параллельной разбивки")
+    parser.add_argument("--chunk-compression", choices=["gz", "xz", "bz2"],
+                        help="сжимать csv чанки блоками, которые распаковываются параллельно")
+    parser.add_argument("--dedup", type=float, metavar="ERROR_RATE",
+                        help="пропускать повторные вакансии (название, работодатель, город, дата публикации) "
+                             "по фильтру Блума в папке чанков с заданной вероятностью ложного срабатывания, "
+                             "например 0.001; с --append выгрузка проверяется по всей истории")
+    parser.add_argument("--stats-only", action="store_true",
+                        help="вывести статистику в JSON без графиков и PDF")
+    parser.add_argument("--cube-by",
+                        help="вывести в JSON свертку куба по измерениям через запятую из " + ", ".join(cube.DIMENSIONS)
+                             + " с фильтрами --city, --experience и --period")
+    parser.add_argument("--experience", help="опыт работы из experience_id для --cube-by")
+    parser.add_argument("--period", help="период START:END вида YYYY или YYYY-MM для --cube-by, границы включительно")
+    parser.add_argument("--pdf-backend", choices=["auto", "wkhtmltopdf", "matplotlib"], default="auto",
+                        help="auto - wkhtmltopdf, если он найден, иначе PDF средствами matplotlib")
+    parser.add_argument("--wkhtmltopdf", help="путь до wkhtmltopdf, также берется из переменной WKHTMLTOPDF")
+    parser.add_argument("--pdf-workers", type=int, default=4, help="число одновременно сохраняемых PDF")
+    parser.add_argument("--outlier-filter", choices=["fixed", "sketch"], default="fixed",
+                        help="fixed - отсекать зарплаты выше %d, sketch - порог по квантилям всех зарплат" % MAX_SALARY)
+    parser.add_argument("--outlier-fence", type=float, default=3.0,
+                        help="ширина ограды Тьюки в межквартильных размахах логарифма зарплаты для --outlier-filter sketch")
+    parser.add_argument("--currency-table",
+                        help="csv файл с месячными курсами валют к рублю (поля date и коды валют) "
+                             "для перевода зарплат с полем salary_currency в рубли")
+    parser.add_argument("--trace", help="json или csv файл для замеров времени, памяти и скорости этапов")
+    parser.add_argument("--profile", help="папка для файлов cProfile по этапам, работает вместе с --trace")
+    args = parser.parse_args()
+    if args.stats_only and not args.cube_by and not args.queries and (args.prof is None or args.city is None):
+        parser.error("для --stats-only нужны --prof и --city или --queries")
+    if args.skip_chunking and args.append:
+        parser.error("--skip-chunking и --append несовместимы")
+    if args.dedup is not None and not 0 < args.dedup < 1:
+        parser.error("--dedup должен быть в интервале (0, 1)")
+    if args.dedup is not None and args.skip_chunking:
+        parser.error("--dedup работает при разбивке на чанки и несовместим с --skip-chunking")
+    if args.chunk_compression and args.format != "csv":
+        parser.error("--chunk-compression работает только с --format csv")
+    compression = "." + args.chunk_compression if args.chunk_compression else ""
+    cube_by = tuple(args.cube_by.split(",")) if args.cube_by else ()
+    if set(cube_by) - set(cube.DIMENSIONS):
+        parser.error("неизвестные измерения --cube-by: " + ", ".join(sorted(set(cube_by) - set(cube.DIMENSIONS))))
+    period_start, _, period_end = (args.period or "").partition(":")
+
+    tracer = profiling.Tracer(args.profile) if args.trace else None
+    currency = CurrencyTable.load(args.currency_table) if args.currency_table else None
+    cache = AggregateCache(args.cache, args.cache_size * 1024 * 1024) if args.cache else None
+    if not args.skip_chunking:
+        file_name = args.file_name or input("Введите название файла: ")
+        with profiling.stage(tracer, "chunking", file=file_name) as record:
+            record["bytes"] = os.path.getsize(file_name)
+            if args.append:
+                max_salary = MAX_SALARY
+                if args.outlier_filter == "sketch" and os.path.isdir("csv"):
+                    max_salary = salary_cutoff(sorted(chunks("csv", args.format, compression)), args.mode,
+                                               args.engine, cache, None, args.outlier_fence, currency)
+                ingest(file_name, fmt=args.format, cache=cache, currency=currency, workers=args.chunk_workers,
+                       compression=compression, dedup_rate=args.dedup, max_salary=max_salary)
+            else:
+                chuncker.сsv_chuncker(file_name, fmt=args.format, workers=args.chunk_workers,
+                                      compression=compression, dedup_rate=args.dedup)
+    file_names = sorted(chunks("csv", args.format, compression))
+    if args.queries:
+        queries = read_queries(args.queries)
+    elif not cube_by:
+        prof_name = args.prof if args.prof is not None else input("Введите название профессии: ")
+        city_name = args.city if args.city is not None else input("Введите название города: ")
+        queries = [(prof_name, city_name)]
+    max_salary = MAX_SALARY
+    if args.outlier_filter == "sketch":
+        max_salary = salary_cutoff(file_names, args.mode, args.engine, cache, tracer, args.outlier_fence, currency)
+
+    if cube_by:
+        json.dump(collect_cube(file_names, args.mode, cache, tracer, max_salary, currency).rollup_stats(
+            cube_by, args.city, args.experience, period_start or None, period_end or None),
+            sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    elif args.stats_only:
+        json.dump(main_stats(file_names, queries, args.mode, args.engine, cache, tracer, max_salary, currency),
+                  sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        renderer = PdfRenderer(args.pdf_backend, args.wkhtmltopdf, args.pdf_workers)
+        if args.queries:
+            main_batch(file_names, queries, args.mode, args.engine, cache, tracer, renderer, max_salary, currency)
+        else:
+            main_futures(file_names, queries[0][0], queries[0][1], args.mode, args.engine, cache, tracer, renderer,
+                         max_salary, currency)
+    if tracer is not None:
+        tracer.save(args.trace)
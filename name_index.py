@@ -0,0 +1,319 @@
+import os
+import numpy as np
+
+# Файлы сегмента индекса в папке чанка (номер сегмента подставляется в шаблон) и типы их элементов
+INDEX_FILES = {"trigrams": ("name_trigrams.%d.i8", np.int64), "posting_offsets": ("name_posting_offsets.%d.i8", np.int64),
+               "postings": ("name_postings.%d.i4", np.int32), "rows": ("name_rows.%d.i4", np.int32),
+               "offsets": ("name_offsets.%d.i8", np.int64)}
+# Число названий, триграммы которых считаются одним блоком массивов в trigram_keys
+KEYS_BLOCK = 16384
+
+def trigrams(text):
+    """Возвращает множество триграмм строки
+
+        Args:
+            text (str): Строка
+
+        Returns:
+            set: Триграммы строки
+    >>> sorted(trigrams("Java"))
+    ['Jav', 'ava']
+    >>> trigrams("C#")
+    set()
+    """
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def trigram_key(trigram):
+    """Упаковывает триграмму в целое число: по 21 бит на символ, поэтому порядок ключей
+    совпадает с порядком триграмм
+
+        Args:
+            trigram (str): Триграмма
+
+        Returns:
+            int: Ключ триграммы
+    >>> trigram_key("abc") < trigram_key("abd") < trigram_key("ИТ ")
+    True
+    """
+    return ord(trigram[0]) << 42 | ord(trigram[1]) << 21 | ord(trigram[2])
+
+def trigram_keys(names, code_start=0):
+    """Векторно считает ключи trigram_key всех триграмм названий: названия блоками по KEYS_BLOCK
+    раскладываются в матрицу кодов символов, ключи считаются сдвигами столбцов
+
+        Args:
+            names (list): Названия
+            code_start (int): Код первого названия
+
+        Returns:
+            (np.ndarray, np.ndarray): Ключи и коды названий без повторов, отсортированные по ключу, затем по коду
+    >>> keys, codes = trigram_keys(["Java", "ava", "C#"], 5)
+    >>> [(key == trigram_key("ava"), code) for key, code in zip(keys.tolist(), codes.tolist())]
+    [(False, 5), (True, 5), (True, 6)]
+    """
+    all_keys = [np.empty(0, dtype=np.int64)]
+    all_codes = [np.empty(0, dtype=np.int32)]
+    for start in range(0, len(names), KEYS_BLOCK):
+        block = np.array(names[start:start + KEYS_BLOCK], dtype=str)
+        width = block.dtype.itemsize // 4
+        if width < 3:
+            continue
+        chars = block.view(np.uint32).reshape(len(block), width).astype(np.int64)
+        keys = chars[:, :-2] << 42 | chars[:, 1:-1] << 21 | chars[:, 2:]
+        valid = np.arange(width - 2) < (np.char.str_len(block) - 2)[:, None]
+        all_keys.append(keys[valid])
+        all_codes.append((np.nonzero(valid)[0] + code_start + start).astype(np.int32))
+    keys = np.concatenate(all_keys)
+    codes = np.concatenate(all_codes)
+    order = np.lexsort((codes, keys))
+    keys, codes = keys[order], codes[order]
+    unique = np.ones(len(keys), dtype=bool)
+    unique[1:] = (keys[1:] != keys[:-1]) | (codes[1:] != codes[:-1])
+    return keys[unique], codes[unique]
+
+class IndexSegment:
+    """Сегмент индекса названий: триграммы названий с кодами от name_start и строки чанка от row_start.
+    Все части сегмента - плоские массивы, которые отображаются в память без разбора: отсортированные ключи
+    триграмм, коды названий каждой триграммы в формате CSR и номера строк каждого кода названия в формате CSR
+
+        Attributes:
+            name_start (int): Код первого названия, триграммы которого есть в сегменте
+            row_start (int): Номер первой строки сегмента
+            trigrams (np.ndarray): Отсортированные ключи триграмм из trigram_key
+            posting_offsets (np.ndarray): Границы кодов названий каждой триграммы в postings
+            postings (np.ndarray): Коды названий по триграммам, по возрастанию внутри триграммы
+            rows (np.ndarray): Номера строк, упорядоченные по коду названия
+            offsets (np.ndarray): Границы строк каждого кода названия в rows
+    """
+    def __init__(self, name_start, row_start, trigrams, posting_offsets, postings, rows, offsets):
+        """Инициализирует объект IndexSegment
+
+            Args:
+                name_start (int): Код первого названия сегмента
+                row_start (int): Номер первой строки сегмента
+                trigrams (np.ndarray): Отсортированные ключи триграмм
+                posting_offsets (np.ndarray): Границы кодов названий каждой триграммы в postings
+                postings (np.ndarray): Коды названий по триграммам
+                rows (np.ndarray): Номера строк, упорядоченные по коду названия
+                offsets (np.ndarray): Границы строк каждого кода названия в rows
+        """
+        self.name_start = name_start
+        self.row_start = row_start
+        self.trigrams = trigrams
+        self.posting_offsets = posting_offsets
+        self.postings = postings
+        self.rows = rows
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, names, name_codes, name_start=0, row_start=0):
+        """Строит сегмент по названиям с кодами от name_start и строкам от row_start
+
+            Args:
+                names (list): Словарь названий вакансий
+                name_codes (np.ndarray): Код названия для каждой строки чанка
+                name_start (int): Код первого названия сегмента
+                row_start (int): Номер первой строки сегмента
+
+            Returns:
+                IndexSegment: Сегмент
+        """
+        keys, codes = trigram_keys(names[name_start:], name_start)
+        unique_keys, starts = np.unique(keys, return_index=True)
+        posting_offsets = np.append(starts, len(keys)).astype(np.int64)
+        segment_codes = np.asarray(name_codes[row_start:])
+        rows = (np.argsort(segment_codes, kind="stable") + row_start).astype(np.int32)
+        offsets = np.zeros(len(names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(segment_codes, minlength=len(names)), out=offsets[1:])
+        return cls(name_start, row_start, unique_keys, posting_offsets, codes, rows, offsets)
+
+    def save(self, directory, number):
+        """Сохраняет сегмент в папку чанка
+
+            Args:
+                directory (str): Папка чанка
+                number (int): Номер сегмента
+        """
+        for part, (file_name, dtype) in INDEX_FILES.items():
+            np.asarray(getattr(self, part), dtype=dtype).tofile(os.path.join(directory, file_name % number))
+
+    @classmethod
+    def load(cls, directory, number, name_start, row_start):
+        """Отображает в память сегмент из папки чанка
+
+            Args:
+                directory (str): Папка чанка
+                number (int): Номер сегмента
+                name_start (int): Код первого названия сегмента
+                row_start (int): Номер первой строки сегмента
+
+            Returns:
+                IndexSegment: Сегмент
+        """
+        parts = {}
+        for part, (file_name, dtype) in INDEX_FILES.items():
+            path = os.path.join(directory, file_name % number)
+            parts[part] = np.memmap(path, dtype=dtype, mode='r') if os.path.getsize(path) else np.empty(0, dtype)
+        return cls(name_start, row_start, **parts)
+
+    def posting(self, trigram):
+        """Возвращает коды названий сегмента, содержащих триграмму
+
+            Args:
+                trigram (str): Триграмма
+
+            Returns:
+                np.ndarray: Коды названий по возрастанию
+        """
+        key = trigram_key(trigram)
+        position = int(np.searchsorted(self.trigrams, key))
+        if position == len(self.trigrams) or self.trigrams[position] != key:
+            return self.postings[:0]
+        return self.postings[self.posting_offsets[position]:self.posting_offsets[position + 1]]
+
+    def match_codes(self, query_trigrams):
+        """Возвращает коды названий сегмента, содержащих все триграммы запроса
+
+            Args:
+                query_trigrams (set): Непустое множество триграмм
+
+            Returns:
+                np.ndarray: Коды названий-кандидатов
+        """
+        postings = sorted((self.posting(trigram) for trigram in query_trigrams), key=len)
+        candidates = postings[0]
+        for posting in postings[1:]:
+            if not len(candidates):
+                break
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+        return candidates
+
+    def match_rows(self, codes):
+        """Возвращает номера строк сегмента с выбранными кодами названий
+
+            Args:
+                codes (np.ndarray): Коды названий
+
+            Returns:
+                np.ndarray: Номера строк
+        """
+        codes = codes[codes < len(self.offsets) - 1]
+        starts = self.offsets[codes]
+        lengths = self.offsets[codes + 1] - starts
+        shifts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self.rows[shifts + np.arange(len(shifts))]
+
+class NameIndex:
+    """Триграммный инвертированный индекс названий вакансий годового чанка из сегментов IndexSegment.
+    Дозапись в чанк добавляет сегмент только по дописанным строкам и новым названиям, последние сегменты
+    не больше нового перестраиваются вместе с ним, поэтому сегментов O(log) от числа дозаписей,
+    а каждая строка перестраивается O(log) раз
+
+        Attributes:
+            names (list): Словарь названий вакансий
+            segments (list): Сегменты индекса по возрастанию row_start
+    >>> index = NameIndex.build(["Java", "Javascript", "Python"], np.array([0, 2, 1, 0]))
+    >>> index.match_names("Java"), index.match_rows("ava").tolist()
+    ([0, 1], [0, 2, 3])
+    >>> index.segments.append(IndexSegment.build(["Java", "Javascript", "Python", "Java EE"],
+    ...                                          np.array([0, 2, 1, 0, 3, 1]), 3, 4))
+    >>> index.names.append("Java EE")
+    >>> index.match_names("Java"), index.match_rows("ava").tolist()
+    ([0, 1, 3], [0, 2, 3, 4, 5])
+    """
+    def __init__(self, names, segments):
+        """Инициализирует объект NameIndex
+
+            Args:
+                names (list): Словарь названий вакансий
+                segments (list): Сегменты индекса
+        """
+        self.names = names
+        self.segments = segments
+
+    @classmethod
+    def build(cls, names, name_codes):
+        """Строит индекс из одного сегмента по словарю названий и колонке кодов названий
+
+            Args:
+                names (list): Словарь названий вакансий
+                name_codes (np.ndarray): Код названия для каждой строки
+
+            Returns:
+                NameIndex: Индекс
+        """
+        return cls(list(names), [IndexSegment.build(names, name_codes)])
+
+    @staticmethod
+    def append(directory, names, name_codes, segments, name_start, row_start):
+        """Добавляет в индекс чанка сегмент по строкам от row_start и названиям от name_start, сливая с ним
+        последние сегменты, в которых строк не больше, чем в новом. Файлы слитых сегментов удаляются
+
+            Args:
+                directory (str): Папка чанка
+                names (list): Словарь названий вакансий чанка
+                name_codes (np.ndarray): Колонка кодов названий всего чанка
+                segments (list): Пары (name_start, row_start) сегментов из meta.json
+                name_start (int): Число названий до дозаписи
+                row_start (int): Число строк до дозаписи
+
+            Returns:
+                list: Пары (name_start, row_start) сегментов после дозаписи
+        """
+        segments = list(segments)
+        if row_start == len(name_codes) and segments:
+            return segments
+        while segments and row_start - segments[-1][1] <= len(name_codes) - row_start:
+            name_start, row_start = segments.pop()
+            for file_name, dtype in INDEX_FILES.values():
+                os.remove(os.path.join(directory, file_name % len(segments)))
+        IndexSegment.build(names, name_codes, name_start, row_start).save(directory, len(segments))
+        segments.append((name_start, row_start))
+        return segments
+
+    @classmethod
+    def load(cls, directory, names, segments):
+        """Отображает в память индекс из папки чанка
+
+            Args:
+                directory (str): Папка чанка
+                names (list): Словарь названий вакансий чанка
+                segments (list): Пары (name_start, row_start) сегментов из meta.json или None
+
+            Returns:
+                NameIndex: Индекс или None, если у чанка нет индекса
+        """
+        if segments is None:
+            return None
+        return cls(names, [IndexSegment.load(directory, number, name_start, row_start)
+                           for number, (name_start, row_start) in enumerate(segments)])
+
+    def match_names(self, query):
+        """Возвращает коды названий, содержащих подстроку query
+
+            Args:
+                query (str): Название профессии
+
+            Returns:
+                list: Коды подходящих названий по возрастанию
+        """
+        query_trigrams = trigrams(query)
+        if not query_trigrams:
+            candidates = range(len(self.names))
+        else:
+            candidates = np.concatenate([np.empty(0, dtype=np.int32)] +
+                                        [segment.match_codes(query_trigrams) for segment in self.segments]).tolist()
+        return [code for code in candidates if query in self.names[code]]
+
+    def match_rows(self, query):
+        """Возвращает номера строк, название которых содержит подстроку query
+
+            Args:
+                query (str): Название профессии
+
+            Returns:
+                np.ndarray: Номера подходящих строк по возрастанию
+        """
+        codes = np.array(self.match_names(query), dtype=np.int64)
+        return np.sort(np.concatenate([np.empty(0, dtype=np.int32)] +
+                                      [segment.match_rows(codes) for segment in self.segments]))
@@ -0,0 +1,162 @@
+import concurrent.futures
+import io
+import os
+import shutil
+
+WINDOWS_WKHTMLTOPDF = r'C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe'
+
+def find_wkhtmltopdf(binary=None):
+    """Ищет wkhtmltopdf: путь из аргумента, переменная окружения WKHTMLTOPDF, PATH,
+    стандартный путь установки в Windows
+
+        Args:
+            binary (str): Путь до wkhtmltopdf
+
+        Returns:
+            str: Путь до wkhtmltopdf или None, если он не найден
+    """
+    for candidate in (binary, os.environ.get("WKHTMLTOPDF")):
+        if candidate:
+            return candidate
+    found = shutil.which("wkhtmltopdf")
+    if found is not None:
+        return found
+    return WINDOWS_WKHTMLTOPDF if os.path.exists(WINDOWS_WKHTMLTOPDF) else None
+
+def unique_names(pdf_names):
+    """Делает имена PDF файлов уникальными внутри очереди, добавляя номер к повторам
+
+        Args:
+            pdf_names (list): Имена PDF файлов
+
+        Returns:
+            list: Уникальные имена
+    >>> unique_names(["a.pdf", "b.pdf", "a.pdf", "a.pdf"])
+    ['a.pdf', 'b.pdf', 'a_2.pdf', 'a_3.pdf']
+    """
+    used = set()
+    result = []
+    for pdf_name in pdf_names:
+        base, extension = os.path.splitext(pdf_name)
+        name = pdf_name
+        number = 1
+        while name in used:
+            number += 1
+            name = base + "_" + str(number) + extension
+        used.add(name)
+        result.append(name)
+    return result
+
+class PdfRenderer:
+    """Сохраняет отчеты в PDF через wkhtmltopdf или, если его нет, через matplotlib без внешних программ
+
+        Attributes:
+            backend (str): "wkhtmltopdf" или "matplotlib"
+            binary (str): Путь до wkhtmltopdf
+            max_workers (int): Число отчетов, сохраняемых одновременно
+    """
+    def __init__(self, backend="auto", binary=None, max_workers=4):
+        """Инициализирует объект PdfRenderer
+
+            Args:
+                backend (str): "auto" - wkhtmltopdf, если он найден, иначе matplotlib;
+                    "wkhtmltopdf" или "matplotlib" - выбрать явно
+                binary (str): Путь до wkhtmltopdf
+                max_workers (int): Число отчетов, сохраняемых одновременно
+        """
+        self.binary = find_wkhtmltopdf(binary)
+        if backend == "auto":
+            backend = "wkhtmltopdf" if self.binary is not None else "matplotlib"
+        if backend == "wkhtmltopdf" and self.binary is None:
+            raise ValueError("wkhtmltopdf не найден, укажите путь до него или выберите backend matplotlib")
+        if backend not in ("wkhtmltopdf", "matplotlib"):
+            raise ValueError("Неизвестный способ сохранения PDF: " + backend)
+        self.backend = backend
+        self.max_workers = max_workers
+
+    def render(self, report, pdf_name='report.pdf'):
+        """Сохраняет отчет в PDF
+
+            Args:
+                report (Report): Отчет
+                pdf_name (str): Имя PDF файла
+
+            Returns:
+                str: Имя PDF файла
+        """
+        if self.backend == "wkhtmltopdf":
+            self.render_wkhtmltopdf(report, pdf_name)
+        else:
+            self.render_matplotlib(report, pdf_name)
+        return pdf_name
+
+    def render_many(self, reports, pdf_names):
+        """Сохраняет очередь отчетов в PDF, не более max_workers одновременно.
+        Для wkhtmltopdf каждый поток ждет свой процесс, поэтому отчеты рендерятся параллельно
+
+            Args:
+                reports (list): Отчеты
+                pdf_names (list): Имена PDF файлов, повторы получают номер
+
+            Returns:
+                list: Имена сохраненных PDF файлов в порядке reports
+        """
+        pdf_names = unique_names(pdf_names)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(self.render, reports, pdf_names))
+
+    def render_wkhtmltopdf(self, report, pdf_name):
+        """Сохраняет HTML код отчета в PDF через wkhtmltopdf
+
+            Args:
+                report (Report): Отчет
+                pdf_name (str): Имя PDF файла
+        """
+        import pdfkit
+        options = {'enable-local-file-access': None, 'quiet': ''}
+        config = pdfkit.configuration(wkhtmltopdf=self.binary)
+        pdfkit.from_string(report.html, pdf_name, configuration=config, options=options)
+
+    def render_matplotlib(self, report, pdf_name):
+        """Сохраняет отчет в PDF средствами matplotlib: первая страница с графиками, вторая с таблицами
+
+            Args:
+                report (Report): Отчет
+                pdf_name (str): Имя PDF файла
+        """
+        import matplotlib.image
+        from matplotlib.backends.backend_pdf import PdfPages
+        from matplotlib.figure import Figure
+
+        dicts = report.dicts
+        with PdfPages(pdf_name) as pages:
+            figure = Figure(figsize=(8.27, 11.69))
+            figure.suptitle("Аналитика по зарплатам и городам для профессии\n" + report.prof_name, fontsize=16)
+            ax = figure.add_axes([0.03, 0.1, 0.94, 0.78])
+            ax.imshow(matplotlib.image.imread(io.BytesIO(report.png_image()), format="png"))
+            ax.axis("off")
+            pages.savefig(figure)
+
+            figure = Figure(figsize=(8.27, 11.69))
+            ax = figure.add_axes([0.05, 0.45, 0.9, 0.5])
+            ax.axis("off")
+            ax.set_title("Статистика по годам для города " + report.city_name)
+            rows = [[year, salary, amount] for year, salary, amount in
+                    zip(dicts[0][0], dicts[0][3].values(), dicts[0][4].values())]
+            ax.table(cellText=rows or [["", "", ""]], loc="upper center", cellLoc="center",
+                     colLabels=["Год", "Средняя зарплата - " + report.prof_name,
+                                "Количество вакансий - " + report.prof_name])
+
+            ax = figure.add_axes([0.03, 0.03, 0.45, 0.37])
+            ax.axis("off")
+            ax.set_title("Уровень зарплат")
+            ax.table(cellText=[[city, salary] for city, salary in dicts[1][0].items()] or [["", ""]],
+                     colLabels=["Город", "Уровень зарплат"], loc="upper center", cellLoc="center")
+
+            ax = figure.add_axes([0.52, 0.03, 0.45, 0.37])
+            ax.axis("off")
+            ax.set_title("Доля вакансий")
+            ax.table(cellText=[[city, str(percent * 100).replace(".", ",") + "%"]
+                               for city, percent in dicts[1][1].items()] or [["", ""]],
+                     colLabels=["Город", "Доля вакансий"], loc="upper center", cellLoc="center")
+            pages.savefig(figure)
@@ -0,0 +1,164 @@
+import contextlib
+import cProfile
+import csv
+import itertools
+import json
+import os
+import threading
+import time
+try:
+    import resource
+except ImportError:
+    resource = None
+
+_counter = itertools.count()
+
+def peak_rss():
+    """Возвращает пиковое потребление памяти процессом в килобайтах или None, если оно недоступно
+    """
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def path_size(path):
+    """Возвращает размер файла или суммарный размер файлов папки в байтах
+
+        Args:
+            path (str): Путь до файла или папки
+
+        Returns:
+            int: Размер в байтах
+    """
+    if os.path.isdir(path):
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+    return os.path.getsize(path)
+
+def measure(name, function, *args, profile_dir=None, **info):
+    """Выполняет функцию и замеряет ее время, процессорное время потока и пиковую память процесса.
+    Подходит для вызова внутри потоков и процессов пула: замер возвращается вместе с результатом
+
+        Args:
+            name (str): Название этапа
+            function (callable): Функция
+            args: Аргументы функции
+            profile_dir (str): Папка для файлов cProfile, None - без профилирования
+            info: Дополнительные поля замера, например file
+
+        Returns:
+            (object, dict): Результат функции и замер
+    """
+    profiler = cProfile.Profile() if profile_dir is not None else None
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        result = function(*args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(profile_dir, "%s_%d_%d_%d.prof" % (
+                name, os.getpid(), threading.get_ident(), next(_counter))))
+    record = {"stage": name, "wall": time.perf_counter() - wall, "cpu": time.thread_time() - cpu,
+              "peak_rss_kb": peak_rss(), "pid": os.getpid()}
+    record.update(info)
+    return result, record
+
+class Tracer:
+    """Собирает замеры этапов обработки и сохраняет их в JSON или CSV
+
+        Attributes:
+            records (list): Замеры этапов
+            profile_dir (str): Папка для файлов cProfile, None - без профилирования
+    """
+    def __init__(self, profile_dir=None):
+        """Инициализирует объект Tracer
+
+            Args:
+                profile_dir (str): Папка для файлов cProfile, None - без профилирования
+        """
+        self.records = []
+        self.profile_dir = profile_dir
+        self.lock = threading.Lock()
+        if profile_dir is not None:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def add(self, record, rows=None, bytes_read=None):
+        """Добавляет замер, дополняя его числом строк, байтов и скоростью обработки
+
+            Args:
+                record (dict): Замер из measure или stage
+                rows (int): Число обработанных вакансий
+                bytes_read (int): Число прочитанных байтов
+        """
+        if rows is not None:
+            record["rows"] = rows
+            record["rows_per_sec"] = rows / record["wall"] if record["wall"] > 0 else None
+        if bytes_read is not None:
+            record["bytes"] = bytes_read
+        with self.lock:
+            self.records.append(record)
+
+    @contextlib.contextmanager
+    def stage(self, name, **info):
+        """Замеряет этап, выполняемый в текущем процессе. Внутри блока в замер можно записать
+        поля rows и bytes
+
+            Args:
+                name (str): Название этапа
+                info: Дополнительные поля замера
+
+            Yields:
+                dict: Замер этапа
+        """
+        record = {"stage": name}
+        record.update(info)
+        profiler = cProfile.Profile() if self.profile_dir is not None else None
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(os.path.join(self.profile_dir, "%s_%d.prof" % (name, next(_counter))))
+            record["wall"] = time.perf_counter() - wall
+            record["cpu"] = time.process_time() - cpu
+            record["peak_rss_kb"] = peak_rss()
+            record["pid"] = os.getpid()
+            self.add(record, record.pop("rows", None), record.pop("bytes", None))
+
+    def save(self, file_name):
+        """Сохраняет замеры в CSV, если у файла расширение .csv, иначе в JSON
+
+            Args:
+                file_name (str): Название файла
+        """
+        if file_name.endswith(".csv"):
+            fields = []
+            for record in self.records:
+                fields += [field for field in record if field not in fields]
+            with open(file_name, 'w', encoding="utf-8", newline='') as f:
+                writer = csv.DictWriter(f, fields)
+                writer.writeheader()
+                writer.writerows(self.records)
+        else:
+            with open(file_name, 'w', encoding="utf-8") as f:
+                json.dump(self.records, f, ensure_ascii=False, indent=2)
+
+def stage(tracer, name, **info):
+    """Возвращает контекст замера этапа или пустой контекст, если трассировка выключена
+
+        Args:
+            tracer (Tracer): Трассировщик или None
+            name (str): Название этапа
+            info: Дополнительные поля замера
+
+        Returns:
+            contextmanager: Контекст, отдающий словарь замера
+    """
+    if tracer is None:
+        return contextlib.nullcontext({})
+    return tracer.stage(name, **info)
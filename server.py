@@ -0,0 +1,320 @@
+import argparse
+import functools
+import json
+import os
+import socketserver
+import tempfile
+import threading
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import main
+from aggregate import tree_reduce
+from cache import AggregateCache
+from currency import CurrencyTable
+from pdf import PdfRenderer
+from sketch import MAX_SALARY
+
+def read_file_summary(file_name, **kwargs):
+    """Возвращает агрегаты годового чанка вместе с его названием
+
+        Args:
+            file_name (str): Название файла
+            kwargs: Параметры main.read_get_summary
+
+        Returns:
+            (str, dict): Название файла и агрегаты года
+    """
+    return file_name, main.read_get_summary(file_name, **kwargs)
+
+class StatsService:
+    """Держит в памяти агрегаты годовых чанков и отвечает на запросы отчетов без чтения файлов.
+    Пары (название, город) в агрегатах разложены по городам, поэтому запрос просматривает
+    только группы выбранного города. Скетчи в агрегатах есть только
+    по городам, поэтому для квантилей профессии /stats проходит по строкам чанков,
+    в колоночных чанках - только по подходящим строкам из индекса названий
+
+        Attributes:
+            list_files (callable): Возвращает пути до годовых чанков
+            mode (str): "thread" - пул потоков, "process" - пул процессов для загрузки чанков
+            engine (str): "python" или "numpy"
+            cache (AggregateCache): Дисковый кэш агрегатов годовых файлов
+            max_salary (float): Порог выбросов
+            fence (float): Ширина ограды порога выбросов по скетчу или None - фиксированный порог max_salary
+            currency (CurrencyTable): Таблица курсов для перевода зарплат в рубли
+            renderer (PdfRenderer): Способ сохранения PDF для /report
+            summaries (list): Пары (чанк, агрегаты года)
+            file_names (list): Годовые чанки последней загрузки
+            cube (Cube): Куб (месяц, город, опыт) всех чанков для /cube или None, пока /cube не запрашивался
+    """
+    def __init__(self, list_files, mode="thread", engine="python", cache=None, max_salary=MAX_SALARY, currency=None,
+                 renderer=None, cache_size=1024, fence=None):
+        """Инициализирует сервис и загружает агрегаты
+
+            Args:
+                list_files (callable): Возвращает пути до годовых чанков, вызывается при каждой загрузке
+                mode (str): "thread" - пул потоков, "process" - пул процессов для загрузки чанков
+                engine (str): "python" или "numpy"
+                cache (AggregateCache): Дисковый кэш агрегатов, при повторной загрузке читаются только изменившиеся чанки
+                max_salary (float): Порог выбросов
+                currency (CurrencyTable): Таблица курсов для перевода зарплат в рубли
+                renderer (PdfRenderer): Способ сохранения PDF, по умолчанию PdfRenderer()
+                cache_size (int): Число запоминаемых ответов /stats
+                fence (float): Ширина ограды для порога выбросов по скетчу. Если она передана,
+                    порог пересчитывается при каждой загрузке вместо max_salary
+        """
+        self.list_files = list_files
+        self.mode = mode
+        self.engine = engine
+        self.cache = cache
+        self.max_salary = max_salary
+        self.currency = currency
+        self.renderer = renderer
+        self.cache_size = cache_size
+        self.fence = fence
+        self.report_lock = threading.Lock()
+        self.cube_lock = threading.Lock()
+        self.summaries = []
+        self.file_names = []
+        self.cube = None
+        self.stats = None
+        self.cube_stats = None
+        self.load()
+
+    def load(self):
+        """Загружает агрегаты годовых чанков и сбрасывает запомненные ответы и куб, куб строится заново
+        при следующем запросе /cube. При заданной ограде порог выбросов сначала пересчитывается по новым чанкам.
+        Запросы во время загрузки обслуживаются по старым агрегатам
+
+            Returns:
+                int: Число загруженных чанков
+        """
+        file_names = sorted(self.list_files())
+        max_salary = self.max_salary
+        if self.fence is not None:
+            max_salary = main.salary_cutoff(file_names, self.mode, self.engine, self.cache, fence=self.fence,
+                                            currency=self.currency)
+        summaries = main.map_files(partial(read_file_summary, engine=self.engine, cache=self.cache,
+                                           max_salary=max_salary, currency=self.currency),
+                                   file_names, self.mode)
+        loaded = sorted(summaries, key=lambda item: item[1]["year"] or 0)
+        with self.cube_lock:
+            self.file_names = file_names
+            self.max_salary = max_salary
+            self.cube = None
+        self.summaries = loaded
+        self.stats = functools.lru_cache(maxsize=self.cache_size)(self.query_stats)
+        self.cube_stats = functools.lru_cache(maxsize=self.cache_size)(self.query_cube)
+        return len(loaded)
+
+    def data(self, prof_name, city_name, sketch=False):
+        """Вычисляет статистические данные пары (профессия, город) по агрегатам в памяти
+
+            Args:
+                prof_name (str): Имя выбранной профессии
+                city_name (str): Имя выбранного города
+                sketch (bool): Строить скетч зарплат профессии для квантилей проходом по строкам чанков
+
+            Returns:
+                (dict, int): Статистические данные для print_data и общее число вакансий
+        """
+        dataWorker = main.DataWorker()
+        aggregates = []
+        for file_name, summary in self.summaries:
+            salary = None
+            if sketch:
+                salary = main.read_get_prof_salaries([(prof_name, city_name)], file_name, self.engine, self.max_salary,
+                                                     self.currency)[0]
+            aggregates.append(dataWorker.get_data_from_summary(prof_name, summary, city_name, salary))
+        aggregate = tree_reduce(aggregates)
+        return aggregate.to_data(), aggregate.rows
+
+    def query_stats(self, prof_name, city_name):
+        """Вычисляет статистику пары (профессия, город) в виде JSON, результат запоминается в self.stats
+
+            Args:
+                prof_name (str): Имя выбранной профессии
+                city_name (str): Имя выбранного города
+
+            Returns:
+                bytes: Статистика из main.query_stats в JSON
+        """
+        data, total_vacancies = self.data(prof_name, city_name, sketch=True)
+        stats = main.query_stats(data, total_vacancies, prof_name, city_name, self.max_salary)
+        return json.dumps(stats, ensure_ascii=False).encode("utf-8")
+
+    def get_cube(self):
+        """Возвращает куб чанков последней загрузки, при первом вызове после загрузки строит его
+        по кубам годов из кэша
+
+            Returns:
+                Cube: Куб (месяц, город, опыт)
+        """
+        with self.cube_lock:
+            if self.cube is None:
+                self.cube = main.collect_cube(self.file_names, self.mode, self.cache, max_salary=self.max_salary,
+                                              currency=self.currency)
+            return self.cube
+
+    def query_cube(self, by, city_name=None, experience=None, start=None, end=None):
+        """Сворачивает куб в памяти, результат запоминается в self.cube_stats
+
+            Args:
+                by (tuple): Измерения свертки из cube.DIMENSIONS
+                city_name (str): Город или None - все города
+                experience (str): Опыт работы или None - любой опыт
+                start (str): Первый месяц периода включительно или None
+                end (str): Последний месяц периода включительно или None
+
+            Returns:
+                bytes: Записи Cube.rollup_stats в JSON
+        """
+        records = self.get_cube().rollup_stats(by, city_name, experience, start, end)
+        return json.dumps(records, ensure_ascii=False).encode("utf-8")
+
+    def report(self, prof_name, city_name):
+        """Строит PDF отчет пары (профессия, город). Отчеты строятся по одному
+
+            Args:
+                prof_name (str): Имя выбранной профессии
+                city_name (str): Имя выбранного города
+
+            Returns:
+                bytes: PDF файл
+        """
+        data, total_vacancies = self.data(prof_name, city_name)
+        with self.report_lock, tempfile.TemporaryDirectory() as directory:
+            pdf_name = os.path.join(directory, "report.pdf")
+            main.save_report(data, total_vacancies, prof_name, city_name, pdf_name, renderer=self.renderer,
+                             verbose=False)
+            with open(pdf_name, 'rb') as f:
+                return f.read()
+
+class StatsHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов: GET /stats?prof=&city=, GET /report?prof=&city=,
+    GET /cube?by=&city=&experience=&start=&end=, GET /health, POST /reload
+    """
+    def send(self, status, body, content_type="application/json; charset=utf-8"):
+        """Отправляет ответ
+
+            Args:
+                status (int): HTTP статус
+                body (bytes): Тело ответа
+                content_type (str): Тип тела ответа
+        """
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, value):
+        """Отправляет ответ в JSON
+
+            Args:
+                status (int): HTTP статус
+                value (object): Значение для json.dumps
+        """
+        self.send(status, json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        service = self.server.service
+        if url.path == "/health":
+            self.send_json(200, {"status": "ok", "files": len(service.summaries),
+                                 "rows": sum(summary["rows"] for file_name, summary in service.summaries)})
+            return
+        if url.path == "/cube":
+            by = tuple(query.get("by", ["month"])[0].split(","))
+            try:
+                body = service.cube_stats(by, *(query[name][0] if name in query else None
+                                                 for name in ("city", "experience", "start", "end")))
+            except ValueError as error:
+                self.send_json(400, {"error": str(error)})
+                return
+            self.send(200, body)
+            return
+        if url.path not in ("/stats", "/report"):
+            self.send_json(404, {"error": "неизвестный путь " + url.path})
+            return
+        if "prof" not in query or "city" not in query:
+            self.send_json(400, {"error": "нужны параметры prof и city"})
+            return
+        prof_name, city_name = query["prof"][0], query["city"][0]
+        if url.path == "/stats":
+            self.send(200, service.stats(prof_name, city_name))
+        else:
+            self.send(200, service.report(prof_name, city_name), "application/pdf")
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/reload":
+            self.send_json(404, {"error": "неизвестный путь " + self.path})
+            return
+        self.send_json(200, {"status": "ok", "files": self.server.service.load()})
+
+    def address_string(self):
+        return self.client_address[0] if self.client_address else self.server.server_address
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP сервер на unix сокете
+    """
+    daemon_threads = True
+
+def make_server(address, service):
+    """Создает HTTP сервер: адрес с "/" - путь до unix сокета, иначе "порт" или "хост:порт"
+
+        Args:
+            address (str): Адрес сервера
+            service (StatsService): Сервис статистики
+
+        Returns:
+            socketserver.BaseServer: Сервер
+    """
+    if "/" in address:
+        if os.path.exists(address):
+            os.remove(address)
+        server = UnixHTTPServer(address, StatsHandler)
+    else:
+        host, _, port = address.rpartition(":")
+        server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), StatsHandler)
+    server.service = service
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сервис статистики вакансий с агрегатами в памяти")
+    parser.add_argument("--listen", default="127.0.0.1:8000", help="порт, хост:порт или путь до unix сокета")
+    parser.add_argument("--chunks-dir", default="csv", help="папка с годовыми чанками из main.py")
+    parser.add_argument("--format", choices=["csv", "columnar"], default="csv", help="формат годовых чанков")
+    parser.add_argument("--chunk-compression", choices=["gz", "xz", "bz2"], help="сжатие csv чанков")
+    parser.add_argument("--mode", choices=["thread", "process"], default="thread")
+    parser.add_argument("--engine", choices=["python", "numpy"], default="python")
+    parser.add_argument("--outlier-filter", choices=["fixed", "sketch"], default="fixed",
+                        help="fixed - отсекать зарплаты выше " + str(MAX_SALARY) + ", sketch - порог по квантилям")
+    parser.add_argument("--outlier-fence", type=float, default=3.0, help="ширина ограды для --outlier-filter sketch")
+    parser.add_argument("--currency-table", help="csv файл с месячными курсами валют к рублю")
+    parser.add_argument("--cache", metavar="DIR", help="папка дискового кэша агрегатов, без нее чанки читаются заново")
+    parser.add_argument("--cache-size", type=int, default=256, help="предельный размер кэша в мегабайтах")
+    parser.add_argument("--pdf-backend", choices=["auto", "wkhtmltopdf", "matplotlib"], default="auto")
+    parser.add_argument("--wkhtmltopdf", help="путь до wkhtmltopdf")
+    args = parser.parse_args()
+
+    compression = "." + args.chunk_compression if args.chunk_compression else ""
+    cache = AggregateCache(args.cache, args.cache_size * 1024 * 1024) if args.cache else None
+    currency = CurrencyTable.load(args.currency_table) if args.currency_table else None
+
+    def list_files():
+        return list(main.chunks(args.chunks_dir, args.format, compression))
+
+    fence = args.outlier_fence if args.outlier_filter == "sketch" else None
+    service = StatsService(list_files, args.mode, args.engine, cache, MAX_SALARY, currency,
+                           PdfRenderer(args.pdf_backend, args.wkhtmltopdf), fence=fence)
+    server = make_server(args.listen, service)
+    print("Serving", args.listen, "files:", len(service.summaries))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,233 @@
+import math
+
+SKETCH_K = 128
+# Фиксированный порог выбросов: зарплаты выше считаются ошибками выгрузки
+MAX_SALARY = 20000000
+# Допустимое отклонение новой оценки порога выбросов от сохраненного порога в логарифмической шкале:
+# в его пределах порог не меняется, и агрегаты с этим порогом остаются в кэше
+CUTOFF_TOLERANCE = 0.1
+
+class KLLSketch:
+    """Объединяемый скетч квантилей KLL с ограниченной памятью.
+    Значения хранятся по уровням, значение уровня h имеет вес 2**h. Переполненный уровень
+    сортируется, и каждое второе значение переходит на следующий уровень. Сжатие детерминировано:
+    сдвиг выбора чередуется на каждом уровне, поэтому одинаковые данные дают одинаковый скетч
+
+        Attributes:
+            k (int): Точность скетча, ошибка ранга порядка 1/k
+            levels (list): Значения по уровням
+            offsets (list): Сдвиг следующего сжатия каждого уровня
+            count (int): Число добавленных значений
+            stored (int): Число хранимых значений
+            limit (int): Общая вместимость уровней
+    >>> sketch = KLLSketch()
+    >>> sketch.update_many(range(1, 101))
+    >>> sketch.quantile(0.5), len(sketch)
+    (50, 100)
+    >>> other = KLLSketch()
+    >>> other.update_many(range(101, 201))
+    >>> abs(sketch.merge(other).quantile(0.5) - 100) <= 2, len(sketch)
+    (True, 200)
+    """
+    __slots__ = ("k", "levels", "offsets", "count", "stored", "limit")
+
+    def __init__(self, k=SKETCH_K):
+        """Инициализирует пустой скетч
+
+            Args:
+                k (int): Точность скетча
+        """
+        self.k = k
+        self.levels = [[]]
+        self.offsets = [0]
+        self.count = 0
+        self.stored = 0
+        self.limit = k
+
+    @classmethod
+    def from_values(cls, values, k=SKETCH_K):
+        """Создает скетч по набору значений
+
+            Args:
+                values (iterable): Значения
+                k (int): Точность скетча
+
+            Returns:
+                KLLSketch: Скетч
+        """
+        sketch = cls(k)
+        sketch.update_many(values)
+        return sketch
+
+    def __getstate__(self):
+        return (self.k, self.levels, self.offsets, self.count, self.stored, self.limit)
+
+    def __setstate__(self, state):
+        self.k, self.levels, self.offsets, self.count, self.stored, self.limit = state
+
+    def __len__(self):
+        return self.count
+
+    def capacity(self, level):
+        """Возвращает вместимость уровня: верхний уровень вмещает k значений, нижние геометрически меньше
+
+            Args:
+                level (int): Номер уровня
+
+            Returns:
+                int: Вместимость уровня
+        """
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def grow(self):
+        """Добавляет верхний уровень и пересчитывает общую вместимость
+        """
+        self.levels.append([])
+        self.offsets.append(0)
+        self.limit = sum(self.capacity(level) for level in range(len(self.levels)))
+
+    def update(self, value):
+        """Добавляет значение
+
+            Args:
+                value (float): Значение
+        """
+        self.levels[0].append(value)
+        self.count += 1
+        self.stored += 1
+        if self.stored >= self.limit:
+            self.compress()
+
+    def update_many(self, values):
+        """Добавляет несколько значений
+
+            Args:
+                values (iterable): Значения
+        """
+        level = self.levels[0]
+        before = len(level)
+        level.extend(values)
+        self.count += len(level) - before
+        self.stored += len(level) - before
+        self.compress()
+
+    def compress(self):
+        """Сжимает переполненные уровни снизу вверх, пока значения не поместятся в общую вместимость
+        """
+        while self.stored >= self.limit:
+            for level in range(len(self.levels)):
+                items = self.levels[level]
+                if len(items) >= self.capacity(level):
+                    if level + 1 == len(self.levels):
+                        self.grow()
+                    items.sort()
+                    keep = [items.pop()] if len(items) % 2 else []
+                    promoted = items[self.offsets[level]::2]
+                    self.levels[level + 1].extend(promoted)
+                    self.offsets[level] ^= 1
+                    self.levels[level] = keep
+                    self.stored -= len(items) - len(promoted)
+                    if self.stored < self.limit:
+                        break
+
+    def merge(self, other):
+        """Добавляет в скетч значения другого скетча
+
+            Args:
+                other (KLLSketch): Другой скетч
+
+            Returns:
+                KLLSketch: Этот скетч
+        """
+        while len(self.levels) < len(other.levels):
+            self.grow()
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.count += other.count
+        self.stored += other.stored
+        self.compress()
+        return self
+
+    def copy(self):
+        """Возвращает независимую копию скетча
+
+            Returns:
+                KLLSketch: Копия
+        """
+        sketch = KLLSketch(self.k)
+        sketch.levels = [list(items) for items in self.levels]
+        sketch.offsets = list(self.offsets)
+        sketch.count = self.count
+        sketch.stored = self.stored
+        sketch.limit = self.limit
+        return sketch
+
+    def quantile(self, q):
+        """Возвращает приближенный квантиль
+
+            Args:
+                q (float): Уровень квантиля от 0 до 1
+
+            Returns:
+                float: Квантиль или None для пустого скетча
+        """
+        weighted = sorted((value, 1 << level) for level, items in enumerate(self.levels) for value in items)
+        if not weighted:
+            return None
+        total = sum(weight for value, weight in weighted)
+        target = q * total
+        passed = 0
+        for value, weight in weighted:
+            passed += weight
+            if passed >= target:
+                return value
+        return weighted[-1][0]
+
+    def quantiles(self, qs=(0.1, 0.5, 0.9)):
+        """Возвращает несколько квантилей
+
+            Args:
+                qs (tuple): Уровни квантилей
+
+            Returns:
+                dict: Уровень квантиля -> значение
+        """
+        return {q: self.quantile(q) for q in qs}
+
+def merge_sketches(sketches, k=SKETCH_K):
+    """Объединяет скетчи в новый, не изменяя исходные
+
+        Args:
+            sketches (iterable): Скетчи
+            k (int): Точность нового скетча
+
+        Returns:
+            KLLSketch: Объединенный скетч
+    """
+    result = KLLSketch(k)
+    for sketch in sketches:
+        result.merge(sketch)
+    return result
+
+def robust_cutoff(sketch, fence=3.0):
+    """Возвращает порог выбросов по правилу Тьюки в логарифмической шкале:
+    значения выше exp(log(q75) + fence * (log(q75) - log(q25))) считаются выбросами
+
+        Args:
+            sketch (KLLSketch): Скетч всех зарплат
+            fence (float): Ширина ограды в межквартильных размахах
+
+        Returns:
+            float: Порог или inf, если данных для оценки нет
+    >>> sketch = KLLSketch()
+    >>> sketch.update_many([10000, 20000, 40000, 80000] * 25 + [10 ** 9])
+    >>> 80000 < robust_cutoff(sketch) < 10 ** 9
+    True
+    """
+    q25 = sketch.quantile(0.25)
+    q75 = sketch.quantile(0.75)
+    if q25 is None or q25 <= 0 or q75 <= 0:
+        return math.inf
+    log_q75 = math.log(q75)
+    return math.exp(log_q75 + fence * (log_q75 - math.log(q25)))
@@ -0,0 +1,381 @@
+import csv
+import json
+import os
+from array import array
+import numpy as np
+from aggregate import Aggregate, BatchAggregate
+from chuncker import COLUMNAR_SUFFIX, ColumnarChunk, open_lines
+from currency import RUBLES, month_number
+from name_index import NameIndex
+from sketch import MAX_SALARY, KLLSketch
+
+def categorize(values):
+    """Кодирует значения колонки целыми кодами в порядке первого появления
+
+        Args:
+            values (list): Значения колонки
+
+        Returns:
+            (np.ndarray, np.ndarray): Коды для каждой строки и словарь значений
+    """
+    mapping = {}
+    codes = np.fromiter((mapping.setdefault(value, len(mapping)) for value in values), dtype=np.int64,
+                        count=len(values))
+    return codes, np.array(list(mapping), dtype=str)
+
+def load_columns(file_name, currency=None):
+    """Потоково загружает годовой чанк в колонки: зарплаты float64 (NaN для пустых),
+    закодированные города и названия вакансий. Колонки наполняются по ходу чтения,
+    поэтому память растет на несколько байт на вакансию, а не на список строк
+
+        Args:
+            file_name (str): Название файла
+            currency (CurrencyTable): Таблица курсов. Если она передана и в файле есть поле salary_currency,
+                зарплаты переводятся в рубли, зарплаты с неизвестным курсом становятся NaN
+
+        Returns:
+            dict: Колонки чанка
+    """
+    nan = float("nan")
+    salary = array('d')
+    area_codes = array('i')
+    name_codes = array('i')
+    currency_codes = array('i')
+    month_codes = array('i')
+    area_names = {}
+    names = {}
+    currencies = {}
+    months = {}
+    published_at = ""
+    with open_lines(file_name) as lines:
+        reader = csv.reader(lines, delimiter=',')
+        fields = next(reader, [])
+        padding = len(fields)
+        indexes = {field: fields.index(field) if field in fields else padding
+                   for field in ("salary", "area_name", "name", "published_at", "salary_currency")}
+        salary_index, area_index, name_index, date_index, currency_index = indexes.values()
+        convert = currency is not None and "salary_currency" in fields
+        for row in reader:
+            if not row:
+                continue
+            row.append("")
+            value = row[salary_index]
+            salary.append(float(value) if value else nan)
+            area_codes.append(area_names.setdefault(row[area_index], len(area_names)))
+            name_codes.append(names.setdefault(row[name_index], len(names)))
+            published_at = row[date_index]
+            if convert:
+                currency_codes.append(currencies.setdefault(row[currency_index], len(currencies)))
+                month_codes.append(months.setdefault(published_at[:7], len(months)))
+    salary = np.frombuffer(salary, dtype=np.float64)
+    if convert and not set(currencies) <= set(RUBLES):
+        month_numbers = np.array([month_number(text) if len(text) == 7 else -1 for text in months], dtype=np.int64)
+        salary = currency.convert_array(salary, np.array(list(currencies), dtype=str),
+                                        np.frombuffer(currency_codes, dtype=np.int32),
+                                        month_numbers[np.frombuffer(month_codes, dtype=np.int32)])
+    year = int(published_at.split("-")[0]) if published_at else None
+    return {"year": year, "salary": salary,
+            "area_codes": np.frombuffer(area_codes, dtype=np.int32), "area_names": np.array(list(area_names), dtype=str),
+            "name_codes": np.frombuffer(name_codes, dtype=np.int32), "names": np.array(list(names), dtype=str)}
+
+def load_columnar(directory, currency=None):
+    """Отображает в память годовой чанк в колоночном формате, колонки - представления NumPy без копирования
+
+        Args:
+            directory (str): Папка чанка
+            currency (CurrencyTable): Таблица курсов. Если она передана и в чанке есть валюты кроме рубля,
+                зарплаты переводятся в рубли по месяцу публикации из колонки published_month
+
+        Returns:
+            dict: Колонки чанка в том же виде, что и у load_columns
+    """
+    with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+
+    def column(field, dtype):
+        if meta["rows"] == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(directory, field + ColumnarChunk.extensions[field]), dtype=dtype, mode='r',
+                         shape=(meta["rows"],))
+
+    salary = column("salary", np.float64)
+    months = column("published_month", np.int32)
+    currencies = meta["currencies"]
+    if currency is not None and not set(currencies) <= set(RUBLES):
+        salary = currency.convert_array(salary, np.array(currencies, dtype=str),
+                                        column("salary_currency", np.int32), months)
+    return {"year": meta["year"], "salary": salary,
+            "area_codes": column("area_name", np.int32), "area_names": np.array(meta["area_names"], dtype=str),
+            "name_codes": column("name", np.int32), "names": np.array(meta["names"], dtype=str),
+            "months": months, "experience_codes": column("experience_id", np.int32),
+            "experiences": np.array(meta["experiences"], dtype=str), "path": directory,
+            "index_segments": meta.get("name_index")}
+
+def load(file_name, currency=None):
+    """Загружает годовой чанк в колонки, выбирая способ по формату чанка
+
+        Args:
+            file_name (str): Название файла или папки чанка
+            currency (CurrencyTable): Таблица курсов для перевода зарплат в рубли
+
+        Returns:
+            dict: Колонки чанка
+    """
+    if file_name.endswith(COLUMNAR_SUFFIX):
+        return load_columnar(file_name, currency)
+    return load_columns(file_name, currency)
+
+def tail(columns, start):
+    """Возвращает колонки колоночного чанка, начиная со строки start, словари остаются общими.
+    Индекс названий нумерует строки всего чанка, поэтому в части его нет
+
+        Args:
+            columns (dict): Колонки чанка из load_columnar
+            start (int): Номер первой строки
+
+        Returns:
+            dict: Колонки дописанной части чанка
+    """
+    return {"year": columns["year"], "salary": columns["salary"][start:],
+            "area_codes": columns["area_codes"][start:], "area_names": columns["area_names"],
+            "name_codes": columns["name_codes"][start:], "names": columns["names"],
+            "months": columns["months"][start:],
+            "experience_codes": columns["experience_codes"][start:], "experiences": columns["experiences"]}
+
+def to_array(typecode, values):
+    """Копирует массив NumPy в array.array, который сохраняется в кэш без NumPy
+
+        Args:
+            typecode (str): Тип элементов array.array ('i', 'q' или 'd')
+            values (np.ndarray): Значения
+
+        Returns:
+            array: Значения
+    >>> to_array('q', np.arange(3))
+    array('q', [0, 1, 2])
+    """
+    result = array(typecode)
+    result.frombytes(np.ascontiguousarray(values, dtype=np.dtype(typecode)).tobytes())
+    return result
+
+def group_sketches(values, codes, length):
+    """Строит скетч квантилей для каждого кода группы: значения упорядочиваются по коду,
+    и каждый скетч заполняется своим непрерывным срезом
+
+        Args:
+            values (np.ndarray): Значения
+            codes (np.ndarray): Код группы для каждого значения
+            length (int): Число групп
+
+        Returns:
+            list: Скетч для каждого кода группы
+    """
+    order = np.argsort(codes, kind="stable")
+    grouped = values[order]
+    offsets = np.zeros(length + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=length), out=offsets[1:])
+    return [KLLSketch.from_values(grouped[offsets[code]:offsets[code + 1]].tolist()) for code in range(length)]
+
+def get_city_data(columns, max_salary=MAX_SALARY):
+    """Векторно вычисляет суммы, количества и скетчи зарплат по городам. Результат не зависит от запроса,
+    поэтому запоминается в колонках чанка для каждого порога выбросов и считается один раз для всех запросов
+
+        Args:
+            columns (dict): Колонки чанка
+            max_salary (float): Порог выбросов, зарплаты выше него не учитываются
+
+        Returns:
+            (dict, dict): Суммы, количества и скетчи зарплат по городам, количества вакансий по городам
+    """
+    city_data = columns.setdefault("city_data", {})
+    if max_salary in city_data:
+        return city_data[max_salary]
+    salary = columns["salary"]
+    area_names = columns["area_names"]
+    valid = salary <= max_salary
+    valid_codes = columns["area_codes"][valid]
+    valid_salary = salary[valid]
+    sums = np.bincount(valid_codes, weights=valid_salary, minlength=len(area_names))
+    counts = np.bincount(valid_codes, minlength=len(area_names))
+    sketches = group_sketches(valid_salary, valid_codes, len(area_names))
+    cities_salary = {}
+    cities_amount = {}
+    present, first_index = np.unique(valid_codes, return_index=True)
+    for code in present[np.argsort(first_index, kind="stable")]:
+        cities_salary[str(area_names[code])] = [float(sums[code]), int(counts[code]), sketches[code]]
+        cities_amount[str(area_names[code])] = int(counts[code])
+    city_data[max_salary] = (cities_salary, cities_amount)
+    return city_data[max_salary]
+
+def get_prof_rows(prof_name, columns):
+    """Возвращает номера строк, название которых содержит prof_name. При наличии индекса названий
+    просматриваются только подходящие строки, иначе строится маска по словарю названий.
+    Индекс колоночного чанка отображается в память при первом запросе профессии
+
+        Args:
+            prof_name (str): Имя выбранной профессии
+            columns (dict): Колонки чанка
+
+        Returns:
+            np.ndarray: Номера подходящих строк
+    """
+    if "name_index" not in columns and "path" in columns:
+        columns["name_index"] = NameIndex.load(columns["path"], columns["names"].tolist(), columns["index_segments"])
+    name_index = columns.get("name_index")
+    if name_index is not None:
+        return name_index.match_rows(prof_name)
+    prof_names = np.fromiter((prof_name in name for name in columns["names"]), dtype=bool,
+                             count=len(columns["names"]))
+    return np.flatnonzero(prof_names[columns["name_codes"]])
+
+def get_prof_salary(prof_name, columns, city_name, max_salary=MAX_SALARY):
+    """Векторно считает сумму, количество и скетч зарплат выбранной профессии в выбранном городе
+
+        Args:
+            prof_name (str): Имя выбранной профессии
+            columns (dict): Колонки чанка из load
+            city_name (str): Имя выбранного города
+            max_salary (float): Порог выбросов, зарплаты выше него не учитываются
+
+        Returns:
+            list: [сумма, количество, скетч] зарплат
+    """
+    city_codes = np.flatnonzero(columns["area_names"] == city_name)
+    salary_sum = 0.0
+    salary_count = 0
+    salary_sketch = KLLSketch()
+    if len(city_codes) != 0:
+        rows = get_prof_rows(prof_name, columns)
+        prof_salary = columns["salary"][rows]
+        selected = (prof_salary <= max_salary) & (columns["area_codes"][rows] == city_codes[0])
+        salary_sum = float(prof_salary[selected].sum())
+        salary_count = int(np.count_nonzero(selected))
+        salary_sketch.update_many(prof_salary[selected].tolist())
+    return [salary_sum, salary_count, salary_sketch]
+
+def get_data(prof_name, columns, city_name, max_salary=MAX_SALARY):
+    """Векторно вычисляет статистику года, результат совпадает с DataWorker.get_data_stream
+
+        Args:
+            prof_name (str): Имя выбранной профессии
+            columns (dict): Колонки чанка из load
+            city_name (str): Имя выбранного города
+            max_salary (float): Порог выбросов, зарплаты выше него не учитываются
+
+        Returns:
+            Aggregate: Статистические данные года и число вакансий
+    """
+    salary = get_prof_salary(prof_name, columns, city_name, max_salary)
+    cities_salary, cities_amount = get_city_data(columns, max_salary)
+    return Aggregate.from_year(columns["year"], salary, salary, cities_salary, len(columns["salary"]))
+
+def get_prof_salaries(queries, columns, max_salary=MAX_SALARY):
+    """Векторно считает суммы, количества и скетчи зарплат нескольких пар (профессия, город)
+    без агрегатов по городам, результат совпадает с DataWorker.get_prof_salaries
+
+        Args:
+            queries (list): Пары (профессия, город)
+            columns (dict): Колонки чанка из load
+            max_salary (float): Порог выбросов, зарплаты выше него не учитываются
+
+        Returns:
+            list: [сумма, количество, скетч] зарплат для каждой пары в порядке queries
+    """
+    return [get_prof_salary(prof_name, columns, city_name, max_salary) for prof_name, city_name in queries]
+
+def get_batch_data(queries, columns, max_salary=MAX_SALARY):
+    """Векторно вычисляет статистику года для нескольких пар (профессия, город), агрегаты по городам
+    считаются один раз. Результат каждой пары совпадает с get_data
+
+        Args:
+            queries (list): Пары (профессия, город)
+            columns (dict): Колонки чанка из load
+            max_salary (float): Порог выбросов, зарплаты выше него не учитываются
+
+        Returns:
+            BatchAggregate: Статистические данные года всех пар и число вакансий
+    """
+    salaries = get_prof_salaries(queries, columns, max_salary)
+    cities_salary, cities_amount = get_city_data(columns, max_salary)
+    return BatchAggregate.from_year(columns["year"], salaries, cities_salary, len(columns["salary"]))
+
+def get_summary(columns, max_salary=MAX_SALARY):
+    """Векторно считает агрегаты года: суммы и количества по парам (название вакансии, город)
+    в массивах по городам и агрегаты со скетчами по городам. Результат совпадает с DataWorker.get_summary
+    с точностью до порядка групп и кодов названий
+
+        Args:
+            columns (dict): Колонки чанка из load_columns
+            max_salary (float): Порог выбросов, зарплаты выше него не учитываются
+
+        Returns:
+            dict: Год, число вакансий, агрегаты по городам и одна часть - пара (словарь названий,
+                массивы пар по городам)
+    """
+    salary = columns["salary"]
+    valid = salary <= max_salary
+    name_count = len(columns["names"])
+    group_codes = columns["area_codes"][valid].astype(np.int64) * name_count + columns["name_codes"][valid]
+    present, inverse = np.unique(group_codes, return_inverse=True)
+    inverse = inverse.ravel()
+    sums = np.bincount(inverse, weights=salary[valid], minlength=len(present))
+    counts = np.bincount(inverse, minlength=len(present))
+    area_codes, name_codes = np.divmod(present, name_count)
+    used_names, name_codes = np.unique(name_codes, return_inverse=True)
+    bounds = np.flatnonzero(np.diff(area_codes, prepend=-1, append=-1))
+    groups = {}
+    for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        groups[str(columns["area_names"][area_codes[start]])] = (
+            to_array('i', name_codes[start:end]), to_array('d', sums[start:end]), to_array('q', counts[start:end]))
+    cities, cities_amount = get_city_data(columns, max_salary)
+    return {"year": columns["year"], "rows": len(salary), "cities": cities,
+            "parts": [(columns["names"][used_names].tolist(), groups)]}
+
+def get_cube(columns, max_salary=MAX_SALARY):
+    """Векторно строит куб по колоночному чанку. Месяц берется из колонки published_month, как и у csv чанков,
+    опыт работы - из колонки experience_id
+
+        Args:
+            columns (dict): Колонки чанка из load_columnar
+            max_salary (float): Порог выбросов, зарплаты выше него не учитываются
+
+        Returns:
+            Cube: Куб
+    """
+    from cube import Cube
+    salary = columns["salary"]
+    valid = salary <= max_salary
+    month_numbers, month_codes = np.unique(columns["months"][valid], return_inverse=True)
+    month_texts = ["%04d-%02d" % (month // 12, month % 12 + 1) if month >= 0 else ""
+                   for month in month_numbers.tolist()]
+    area_count = len(columns["area_names"])
+    experience_count = len(columns["experiences"])
+    cell_codes = ((month_codes.ravel().astype(np.int64) * area_count + columns["area_codes"][valid]) * experience_count
+                  + columns["experience_codes"][valid])
+    present, first_index, inverse = np.unique(cell_codes, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+    sums = np.bincount(inverse, weights=salary[valid], minlength=len(present))
+    counts = np.bincount(inverse, minlength=len(present))
+    sketches = group_sketches(salary[valid], inverse, len(present))
+    cube = Cube()
+    cube.rows = len(salary)
+    for i in np.argsort(first_index, kind="stable"):
+        cell_code, experience_code = divmod(int(present[i]), experience_count)
+        month_code, area_code = divmod(cell_code, area_count)
+        cube.cells.setdefault(str(columns["area_names"][area_code]), {})[
+            (month_texts[month_code], str(columns["experiences"][experience_code]))] = [
+            float(sums[i]), int(counts[i]), sketches[i]]
+    return cube
+
+def get_salary_sketch(columns):
+    """Строит скетч всех непустых зарплат без отсечения выбросов, результат совпадает
+    с DataWorker.get_salary_sketch
+
+        Args:
+            columns (dict): Колонки чанка из load
+
+        Returns:
+            KLLSketch: Скетч зарплат
+    """
+    salary = columns["salary"]
+    return KLLSketch.from_values(salary[~np.isnan(salary)].tolist())